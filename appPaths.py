@@ -0,0 +1,36 @@
+import os
+import sys
+
+APP_NAME = "CyberDL"  # 程序数据目录名
+
+
+def data_dir():
+    """
+    程序数据目录，存放数据库和缓存，首次调用时创建
+
+    Windows下为 %LOCALAPPDATA%\\CyberDL，macOS下为
+    ~/Library/Application Support/CyberDL，其他系统为
+    $XDG_DATA_HOME/CyberDL（默认 ~/.local/share/CyberDL）。
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(name):
+    """
+    程序数据目录中的文件或子目录路径
+
+    Args:
+        name (str): 相对路径，如 "download_archive.db"
+
+    Returns:
+        str: 绝对路径
+    """
+    return os.path.join(data_dir(), name)
@@ -0,0 +1,185 @@
+import threading
+import time
+
+MAX_SLEEP = 0.5  # 单次限速等待的最长时间（秒），便于及时响应暂停/取消
+BURST_SECONDS = 0.25  # 令牌桶容量（按多少秒的速率计算），限制空闲后的突发流量
+ACTIVE_WINDOW = 2.0  # 多久内上报过的任务视为正在下载（秒）
+
+
+class TokenBucket:
+    """
+    允许透支的令牌桶
+
+    每次消耗先扣除令牌，余额为负时返回需要等待的时间，
+    平均速率不会超过设定值。新建的令牌桶是空的，开始下载时
+    没有突发流量。
+    """
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self._tokens = min(self._tokens, rate * BURST_SECONDS)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate * BURST_SECONDS, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self, amount):
+        """
+        消耗令牌
+
+        Args:
+            amount (int): 本次传输的字节数
+
+        Returns:
+            float: 需要等待的秒数，令牌充足时为0
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class BandwidthLimiter:
+    """
+    进程内共享的带宽限制器
+
+    yt-dlp的 ratelimit 只作用于单个实例，N个并发任务会占用N倍带宽。
+    所有任务在进度回调中上报已下载的字节数，由全局令牌桶和可选的
+    站点令牌桶计算等待时间；回调中等待会暂停读取，从而限制实际速率。
+    每个任务另有一个速率为 全局限速/活跃任务数 的令牌桶，
+    避免读取块较大的任务抢占带宽。
+    限速可在运行时随时修改，速率为0或None表示不限速。
+    """
+
+    def __init__(self, rate=None):
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate) if rate else None
+        self._hosts = {}  # 站点 -> TokenBucket
+        self._consumers = {}  # 任务 -> (TokenBucket, 最近上报时间)
+        self._reported = {}  # (任务, 临时文件) -> 已上报的字节数
+
+    @property
+    def active(self):
+        """是否启用了任何限速"""
+        return self._global is not None or bool(self._hosts)
+
+    def set_rate(self, rate):
+        """
+        修改全局限速
+
+        Args:
+            rate (float): 字节/秒，0或None表示不限速
+        """
+        with self._lock:
+            if not rate:
+                self._global = None
+            elif self._global is None:
+                self._global = TokenBucket(rate)
+            else:
+                self._global.set_rate(rate)
+
+    def set_host_rate(self, host, rate):
+        """
+        修改单个站点的限速
+
+        Args:
+            host (str): 站点（host_key_from_url的结果）
+            rate (float): 字节/秒，0或None表示取消该站点的限速
+        """
+        with self._lock:
+            if not rate:
+                self._hosts.pop(host, None)
+            elif host in self._hosts:
+                self._hosts[host].set_rate(rate)
+            else:
+                self._hosts[host] = TokenBucket(rate)
+
+    def host_rate(self, host):
+        """站点的限速（字节/秒），未单独限速时为None"""
+        bucket = self._hosts.get(host)
+        return bucket.rate if bucket else None
+
+    def _fair_share(self, consumer, rate):
+        """返回该任务按活跃任务数平分后的令牌桶"""
+        now = time.monotonic()
+        with self._lock:
+            for key, (_, seen) in list(self._consumers.items()):
+                if now - seen > ACTIVE_WINDOW:
+                    del self._consumers[key]
+            bucket = self._consumers.get(consumer, (None, 0))[0]
+            if bucket is None:
+                bucket = TokenBucket(rate)
+            self._consumers[consumer] = (bucket, now)
+            share = rate / len(self._consumers)
+        if bucket.rate != share:
+            bucket.set_rate(share)
+        return bucket
+
+    def report(self, consumer, key, downloaded, host=None):
+        """
+        上报某个文件累计已下载的字节数，返回需要等待的时间
+
+        同一任务的多个分段线程可能同时回调，增量在锁内计算，不会重复或遗漏。
+        每个文件第一次上报的字节数可能来自断点续传的已有数据，不计入。
+
+        Args:
+            consumer (object): 任务标识
+            key (str): 正在写入的临时文件
+            downloaded (int): 该文件累计已下载的字节数
+            host (str): 任务所属站点
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        with self._lock:
+            previous = self._reported.get((consumer, key))
+            self._reported[(consumer, key)] = downloaded
+        if previous is None:
+            return 0.0
+        return self.throttle(downloaded - previous, consumer, host)
+
+    def forget(self, consumer):
+        """丢弃任务的上报记录（任务开始新一次尝试或结束时调用）"""
+        with self._lock:
+            for key in [key for key in self._reported if key[0] == consumer]:
+                del self._reported[key]
+
+    def throttle(self, amount, consumer=None, host=None):
+        """
+        记录下载的字节数并返回需要等待的时间
+
+        Args:
+            amount (int): 自上次上报以来新下载的字节数
+            consumer (object): 任务标识，用于在活跃任务间平分全局带宽
+            host (str): 任务所属站点，该站点单独限速时同时受站点令牌桶约束
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        if amount <= 0:
+            return 0.0
+        global_bucket = self._global
+        host_bucket = self._hosts.get(host)
+        delay = 0.0
+        if global_bucket is not None:
+            delay = global_bucket.consume(amount)
+            if consumer is not None:
+                delay = max(delay, self._fair_share(consumer, global_bucket.rate).consume(amount))
+        if host_bucket is not None:
+            delay = max(delay, host_bucket.consume(amount))
+        return delay
+
+
+# 进程内共享的带宽限制器
+bandwidth_limiter = BandwidthLimiter()
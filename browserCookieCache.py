@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+from cookieJars import make_cookie_jar
+
+COOKIE_CACHE_TTL = 300  # 浏览器Cookie缓存有效期（秒）
+
+
+def _source_mtime(path):
+    """Cookie数据库的修改时间；WAL模式下新写入先落在 -wal 文件中，取两者较新者"""
+    if not path:
+        return None
+    mtimes = []
+    for candidate in (path, path + '-wal'):
+        try:
+            mtimes.append(os.path.getmtime(candidate))
+        except OSError:
+            pass
+    return max(mtimes) if mtimes else None
+
+
+class BrowserCookieCache:
+    """
+    进程内共享的浏览器Cookie缓存
+
+    按 (浏览器配置, 域名) 缓存由已提取的Cookie构建的Cookie jar，批量任务中
+    同一站点只读取一次浏览器数据库，所有任务共享同一个jar。缓存在TTL到期或源数据库修改时间变化时失效；
+    多个worker同时请求同一键时只有一个执行提取，其余等待其结果。
+    提取失败（抛出异常）不缓存，等待者中的下一个会重新尝试。
+    """
+
+    def __init__(self, ttl=COOKIE_CACHE_TTL):
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self._entries = {}  # 键 -> (Cookie jar, 源数据库修改时间, 过期时间)
+        self._inflight = {}  # 键 -> 正在进行的提取完成时触发的Event
+
+    def get(self, profile, domains, loader, source=None):
+        """
+        读取缓存，未命中时调用loader提取
+
+        Args:
+            profile (str): 浏览器配置标识（数据库路径或浏览器名）
+            domains (list): 目标域名
+            loader (callable): 提取函数，返回Cookie列表
+            source (str): 源数据库路径，修改时间变化时缓存失效；None表示只按TTL失效
+
+        Returns:
+            YoutubeDLCookieJar: Cookie jar（可能为空）
+        """
+        key = (profile, tuple(domains))
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and self._fresh(entry, source):
+                    return entry[0]
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+            # 其他worker正在提取同一键，等待后重新检查
+            event.wait()
+
+        try:
+            # 提取前记录修改时间，提取期间发生的修改会在下次读取时使缓存失效
+            mtime = _source_mtime(source)
+            jar = make_cookie_jar(loader())
+            with self._lock:
+                self._entries[key] = (jar, mtime, time.monotonic() + self.ttl)
+            return jar
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def _fresh(self, entry, source):
+        _, mtime, expires = entry
+        return time.monotonic() < expires and _source_mtime(source) == mtime
+
+
+# 进程内共享的浏览器Cookie缓存
+browser_cookie_cache = BrowserCookieCache()
@@ -0,0 +1,240 @@
+import os
+import queue
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from browserCookieCache import browser_cookie_cache
+from domainMatcher import DomainMatcher
+
+# 各浏览器Cookie表的查询：(表名, 主机列, 其余列)
+CHROME_QUERY = ('cookies', 'host_key', 'path, secure, expires_utc, name, value, encrypted_value')
+FIREFOX_QUERY = ('moz_cookies', 'host', 'path, isSecure, expiry, name, value')
+
+CHROME_EPOCH_OFFSET = 11644473600  # Chrome时间戳从1601年起算（微秒），与Unix时间的差（秒）
+BROWSER_PROBE_TIMEOUT = 10  # 探测单个浏览器的超时时间（秒），各浏览器并行探测
+
+_winners_lock = threading.Lock()
+_winners = {}  # 目标域名 -> 上次提供了Cookie的浏览器
+
+
+def _has_pending_wal(path):
+    """WAL文件中还有未写回主库的数据（immutable模式会忽略WAL）"""
+    try:
+        return os.path.getsize(path + '-wal') > 0
+    except OSError:
+        return False
+
+
+@contextmanager
+def open_cookie_db(path):
+    """
+    只读打开浏览器Cookie数据库
+
+    优先以SQLite的immutable URI模式直接打开，不复制文件也不加锁；
+    WAL中有未写回的数据或直接打开失败（如被浏览器独占锁定）时，
+    退回到复制数据库（连同 -wal 文件）到临时目录再打开。
+
+    Args:
+        path (str): Cookie数据库路径
+
+    Yields:
+        sqlite3.Connection: 只读连接
+    """
+    if not _has_pending_wal(path):
+        conn = None
+        try:
+            uri = f"file:{urllib.request.pathname2url(os.path.abspath(path))}?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True)
+            conn.execute('SELECT 1 FROM sqlite_master LIMIT 1')
+        except sqlite3.Error:
+            if conn is not None:
+                conn.close()
+            conn = None
+        if conn is not None:
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+    # 复制数据库文件
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_db = os.path.join(temp_dir, 'cookies.db')
+        shutil.copy2(path, temp_db)
+        if os.path.exists(path + '-wal'):
+            shutil.copy2(path + '-wal', temp_db + '-wal')
+        conn = sqlite3.connect(temp_db)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def host_filter(column, domains):
+    """
+    一次匹配所有目标域名的WHERE子句
+
+    精确匹配加上以 ".域名" 结尾的子域名匹配，不会误匹配 notyoutube.com
+    这类只是字符串包含的主机。后缀匹配无法使用主机列的索引，整个查询
+    是对Cookie表的一次全表扫描（取代原来每个域名各扫描一次）。
+
+    Args:
+        column (str): 主机列名
+        domains (list): 目标域名（可带前导点）
+
+    Returns:
+        tuple: (WHERE子句, 参数列表)
+    """
+    bases = list(dict.fromkeys(d.lstrip('.').lower() for d in domains if d.strip('.')))
+    exact = [host for base in bases for host in (base, '.' + base)]
+    clauses = [f"{column} IN ({', '.join('?' * len(exact))})"]
+    params = list(exact)
+    for base in bases:
+        suffix = '.' + base
+        clauses.append(f"substr({column}, -{len(suffix)}) = ?")
+        params.append(suffix)
+    return ' OR '.join(clauses), params
+
+
+def _query(path, query, domains):
+    table, host_column, columns = query
+    where, params = host_filter(host_column, domains)
+    with open_cookie_db(path) as conn:
+        return conn.execute(
+            f'SELECT {host_column}, {columns} FROM {table} WHERE {where}', params
+        ).fetchall()
+
+
+def query_chrome_cookies(cookie_db_path, domains):
+    """查询Chrome Cookie数据库中相关域名的未加密Cookie"""
+    cookies = []
+    for row in _query(cookie_db_path, CHROME_QUERY, domains):
+        host_key, path, secure, expires_utc, name, value, encrypted_value = row
+
+        # 加密的cookie yt-dlp chrome此处无法解密 建议使手动上传cookie或者自行优化
+        if not value and encrypted_value:
+            continue
+
+        cookies.append({
+            'domain': host_key,
+            'path': path,
+            'secure': bool(secure),
+            'expires': expires_utc // 1000000 - CHROME_EPOCH_OFFSET if expires_utc else 0,
+            'name': name,
+            'value': value
+        })
+    return cookies
+
+
+def query_firefox_cookies(cookie_db, domains):
+    """查询Firefox Cookie数据库中相关域名的Cookie"""
+    cookies = []
+    for host, path, isSecure, expiry, name, value in _query(cookie_db, FIREFOX_QUERY, domains):
+        cookies.append({
+            'domain': host,
+            'path': path,
+            'secure': bool(isSecure),
+            'expires': expiry,
+            'name': name,
+            'value': value
+        })
+    return cookies
+
+
+def load_browser_cookie3(browser_func, domains):
+    """通过browser_cookie3读取浏览器的全部Cookie，一次遍历过滤出相关域名"""
+    matcher = DomainMatcher(domains)
+    cookies = []
+    for cookie in browser_func() or ():
+        cookie_domain = getattr(cookie, 'domain', '')
+        if not matcher.matches(cookie_domain):
+            continue
+        cookie_name = getattr(cookie, 'name', '')
+        cookie_value = getattr(cookie, 'value', '')
+        if not cookie_name or not cookie_value:
+            continue
+        cookies.append({
+            'domain': cookie_domain,
+            'path': getattr(cookie, 'path', '/'),
+            'secure': bool(getattr(cookie, 'secure', False)),
+            'expires': getattr(cookie, 'expires', 0) or 0,
+            'name': cookie_name,
+            'value': cookie_value
+        })
+    return cookies
+
+
+def _probe_parallel(browsers, domains, timeout):
+    """并行探测，返回第一个得到Cookie的浏览器；其余探测线程在后台自行结束"""
+    results = queue.Queue()
+
+    def probe(name, func):
+        try:
+            # 同一浏览器与域名的Cookie在进程内只读取一次
+            cookies = browser_cookie_cache.get(name, domains, lambda: load_browser_cookie3(func, domains))
+            results.put((name, cookies, None))
+        except Exception as e:
+            results.put((name, None, e))
+
+    for name, func in browsers:
+        threading.Thread(target=probe, args=(name, func), name=f'cookie-probe-{name}', daemon=True).start()
+
+    failures = {}
+    deadline = time.monotonic() + timeout
+    while len(failures) < len(browsers):
+        try:
+            name, cookies, error = results.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+        if cookies:
+            return name, cookies, failures
+        failures[name] = error
+    for name, _ in browsers:
+        if name not in failures:
+            failures[name] = TimeoutError(f'{name} did not respond within {timeout}s')
+    return None, None, failures
+
+
+def probe_browsers(browsers, domains, timeout=BROWSER_PROBE_TIMEOUT):
+    """
+    从多个浏览器中找出能提供目标域名Cookie的一个
+
+    上次为该域名提供Cookie的浏览器先单独尝试；没有记录或它不再有Cookie时，
+    并行探测其余浏览器，第一个得到Cookie的胜出并记住，超时的浏览器视为失败。
+
+    Args:
+        browsers (list): [(浏览器名, browser_cookie3读取函数)]
+        domains (list): 目标域名
+        timeout (float): 每轮探测的超时时间（秒）
+
+    Returns:
+        tuple: (胜出的浏览器名或None, Cookie jar（失败时为None）, {失败的浏览器名: 异常，无Cookie时为None})
+    """
+    key = tuple(domains)
+    with _winners_lock:
+        preferred = _winners.get(key)
+
+    failures = {}
+    if preferred is not None:
+        first = [(name, func) for name, func in browsers if name == preferred]
+        winner, cookies, failures = _probe_parallel(first, domains, timeout)
+        if winner is not None:
+            return winner, cookies, failures
+        with _winners_lock:
+            _winners.pop(key, None)
+        browsers = [(name, func) for name, func in browsers if name != preferred]
+
+    winner, cookies, more_failures = _probe_parallel(browsers, domains, timeout)
+    failures.update(more_failures)
+    if winner is not None:
+        with _winners_lock:
+            _winners[key] = winner
+    return winner, cookies, failures
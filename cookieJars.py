@@ -0,0 +1,78 @@
+import os
+import threading
+from http.cookiejar import Cookie
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+
+class CookieFileError(Exception):
+    """上传的Cookie文件无法读取或格式不正确，重试无意义"""
+
+
+def make_cookie_jar(cookies):
+    """
+    由Cookie列表构建内存中的Cookie jar，直接交给YoutubeDL会话使用
+
+    Args:
+        cookies (list): [{'domain', 'path', 'secure', 'expires', 'name', 'value'}]
+
+    Returns:
+        YoutubeDLCookieJar: Cookie jar
+    """
+    jar = YoutubeDLCookieJar()
+    for cookie in cookies:
+        domain = cookie['domain']
+        # 没有过期时间（或为0）的是会话Cookie
+        expires = int(cookie['expires']) if cookie.get('expires') else None
+        jar.set_cookie(Cookie(
+            0, cookie['name'], cookie['value'], None, False,
+            domain, domain.startswith('.'), domain.startswith('.'),
+            cookie.get('path') or '/', True, bool(cookie.get('secure')),
+            expires, expires is None, None, None, {}
+        ))
+    return jar
+
+
+class CookieFileCache:
+    """
+    上传的Cookie文件解析结果缓存
+
+    每个文件按修改时间只解析一次，所有使用该文件的任务共享同一个
+    Cookie jar；文件被替换（修改时间变化）后下次读取时重新解析。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jars = {}  # 文件路径 -> (修改时间, Cookie jar)
+
+    def load(self, path):
+        """
+        Args:
+            path (str): Netscape格式的Cookie文件路径
+
+        Returns:
+            YoutubeDLCookieJar: 解析后的Cookie jar
+
+        Raises:
+            OSError: 文件无法读取
+            http.cookiejar.LoadError: 文件格式不正确
+        """
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._jars.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            jar = YoutubeDLCookieJar(path)
+            jar.load()
+            self._jars[path] = (mtime, jar)
+            return jar
+
+    def forget(self, path):
+        """Cookie文件被删除时丢弃其缓存"""
+        with self._lock:
+            self._jars.pop(os.path.abspath(path), None)
+
+
+# 进程内共享的上传Cookie文件缓存
+cookie_file_cache = CookieFileCache()
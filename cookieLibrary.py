@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from cookieJars import cookie_file_cache
+from domainMatcher import candidate_domains, host_from_url
+
+COOKIE_DIR = "cookies"  # 上传的Cookie文件目录
+MIN_COOKIE_FILE_SIZE = 10  # 小于该字节数的文件视为空文件
+
+
+class CookieFileEntry:
+    """
+    Cookie库中的一个文件
+
+    Attributes:
+        name (str): 文件名
+        path (str): 文件路径
+        size (int): 文件大小（字节）
+        mtime (float): 修改时间
+        domains (frozenset): 文件中Cookie覆盖的域名（不含前导点）
+        earliest_expiry (float): 最早过期的持久Cookie的过期时间，全是会话Cookie时为None
+    """
+
+    def __init__(self, path, size, mtime, domains, earliest_expiry):
+        self.name = os.path.basename(path)
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.domains = domains
+        self.earliest_expiry = earliest_expiry
+
+    @property
+    def modified(self):
+        return datetime.fromtimestamp(self.mtime).strftime('%Y-%m-%d')
+
+    def expired(self, now=None):
+        """是否已有Cookie过期（登录状态可能已失效）"""
+        return self.earliest_expiry is not None and self.earliest_expiry <= (now or time.time())
+
+
+def _index_jar(jar):
+    """统计Cookie jar覆盖的域名和最早的过期时间"""
+    domains = set()
+    expiries = []
+    for cookie in jar:
+        domain = cookie.domain.lstrip('.').lower()
+        if domain:
+            domains.add(domain)
+        if cookie.expires:
+            expiries.append(cookie.expires)
+    return frozenset(domains), (min(expiries) if expiries else None)
+
+
+class CookieLibrary:
+    """
+    已上传Cookie文件的索引
+
+    每个文件只在新增或修改（大小、修改时间变化）时解析一次，记录其
+    覆盖的域名与最早过期时间；刷新时只对目录做一次scandir，未变化的
+    文件不再读取。按域名建立倒排索引，入队时根据URL的主机名
+    逐级查找父域名即可选出对应的Cookie文件，混合站点的批量任务
+    可以各自使用对应网站的登录Cookie。
+    """
+
+    def __init__(self, directory=COOKIE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = {}  # 文件路径 -> CookieFileEntry
+        self._by_domain = {}  # 域名 -> [CookieFileEntry]
+
+    def refresh(self):
+        """
+        增量刷新索引：只解析新增或修改过的文件，移除已删除的文件
+
+        Returns:
+            bool: 索引是否发生变化
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        seen = {}
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.name.endswith('.txt') or not item.is_file():
+                    continue
+                stat = item.stat()
+                if stat.st_size > MIN_COOKIE_FILE_SIZE:
+                    seen[os.path.abspath(item.path)] = stat
+
+        with self._lock:
+            changed = False
+            for path in list(self._entries):
+                if path not in seen:
+                    del self._entries[path]
+                    cookie_file_cache.forget(path)
+                    changed = True
+            for path, stat in seen.items():
+                entry = self._entries.get(path)
+                if entry is not None and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+                    continue
+                try:
+                    domains, earliest = _index_jar(cookie_file_cache.load(path))
+                except Exception:
+                    # 无法解析的文件仍然列出，但不参与自动匹配
+                    domains, earliest = frozenset(), None
+                self._entries[path] = CookieFileEntry(path, stat.st_size, stat.st_mtime, domains, earliest)
+                changed = True
+            if changed:
+                self._rebuild_index()
+        return changed
+
+    def _rebuild_index(self):
+        self._by_domain = {}
+        for entry in self._entries.values():
+            for domain in entry.domains:
+                self._by_domain.setdefault(domain, []).append(entry)
+
+    def files(self):
+        """
+        Returns:
+            list: 所有Cookie文件（CookieFileEntry），按文件名排序
+        """
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda entry: entry.name.lower())
+
+    def match(self, url):
+        """
+        为URL选择Cookie文件
+
+        从主机名开始逐级查找父域名（www.youtube.com → youtube.com），
+        短链接等别名站点最后按主站查找（youtu.be → youtube.com），取最具体的匹配；同一级有多个文件时优先没有过期Cookie的，其次最新的。
+
+        Args:
+            url (str): 视频URL
+
+        Returns:
+            CookieFileEntry: 匹配的文件，没有时为None
+        """
+        now = time.time()
+        with self._lock:
+            for domain in candidate_domains(host_from_url(url)):
+                candidates = self._by_domain.get(domain)
+                if candidates:
+                    return max(candidates, key=lambda entry: (not entry.expired(now), entry.mtime))
+        return None
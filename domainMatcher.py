@@ -0,0 +1,153 @@
+import ipaddress
+import urllib.parse
+
+# 多级公共后缀（单级顶级域名如 com、be 默认都是公共后缀）
+PUBLIC_SUFFIXES = (
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk',
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn',
+    'com.hk', 'com.tw', 'com.sg', 'com.my',
+    'co.jp', 'ne.jp', 'or.jp', 'co.kr', 'or.kr',
+    'com.au', 'net.au', 'org.au', 'co.nz',
+    'com.br', 'com.mx', 'com.ar', 'com.tr', 'co.in', 'co.za',
+    'github.io', 'blogspot.com', 'appspot.com',
+)
+
+# 站点别名：短链接或镜像域名 -> 主站域名（Cookie与调度都按主站处理）
+SITE_ALIASES = {
+    'youtu.be': 'youtube.com',
+    'youtube-nocookie.com': 'youtube.com',
+    'x.com': 'twitter.com',
+    'b23.tv': 'bilibili.com',
+    'fb.watch': 'facebook.com',
+    'fb.com': 'facebook.com',
+    'instagr.am': 'instagram.com',
+}
+
+
+class SuffixTrie:
+    """
+    按域名标签从右到左建立的前缀树
+
+    查找一个主机名只需沿标签走一遍（O(标签数)），与树中域名的数量无关。
+    """
+
+    _END = None  # 节点中标记"此处是一个完整域名"的键
+
+    def __init__(self, domains=()):
+        self._root = {}
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain, value=True):
+        node = self._root
+        for label in reversed(normalize_host(domain).split('.')):
+            node = node.setdefault(label, {})
+        node[self._END] = value
+
+    def longest(self, host):
+        """
+        查找主机名本身或其最长的父域名
+
+        Returns:
+            tuple: (匹配的标签数, 值)；没有匹配时为 (0, None)
+        """
+        node = self._root
+        depth, found = 0, (0, None)
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            depth += 1
+            if self._END in node:
+                found = (depth, node[self._END])
+        return found
+
+
+def normalize_host(host):
+    """统一为小写、去掉端口、前导点和末尾的点"""
+    host = (host or '').strip().lower()
+    if host.startswith('['):
+        return host[1:host.find(']')]
+    if host.count(':') == 1:
+        host = host.split(':', 1)[0]
+    return host.strip('.')
+
+
+def host_from_url(url):
+    try:
+        return normalize_host(urllib.parse.urlsplit((url or '').strip()).hostname)
+    except ValueError:
+        return ''
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+_public_suffixes = SuffixTrie(PUBLIC_SUFFIXES)
+
+
+def registrable_domain(host):
+    """
+    可注册域名（公共后缀加一级），如 www.bbc.co.uk -> bbc.co.uk
+
+    IP地址和单级主机名原样返回。
+    """
+    host = normalize_host(host)
+    if not host or _is_ip(host) or '.' not in host:
+        return host
+    labels = host.split('.')
+    suffix_length = max(1, _public_suffixes.longest(host)[0])
+    if len(labels) <= suffix_length:
+        return host
+    return '.'.join(labels[-(suffix_length + 1):])
+
+
+def site_of(host):
+    """主机名所属的站点：可注册域名，别名映射到主站"""
+    domain = registrable_domain(host)
+    return SITE_ALIASES.get(domain, domain)
+
+
+def site_from_url(url):
+    """URL所属的站点，如 https://youtu.be/x -> youtube.com；无法解析时为空字符串"""
+    host = host_from_url(url)
+    return site_of(host) if host else ''
+
+
+def candidate_domains(host):
+    """
+    查找按域名保存的资源（如Cookie文件）时依次尝试的域名
+
+    从主机名逐级到可注册域名（不会到公共后缀），主机属于别名站点时最后加上主站。
+    """
+    host = normalize_host(host)
+    if not host:
+        return []
+    registrable = registrable_domain(host)
+    labels = host.split('.')
+    depth = registrable.count('.') + 1
+    candidates = ['.'.join(labels[start:]) for start in range(len(labels) - depth + 1)]
+    site = SITE_ALIASES.get(registrable)
+    if site:
+        candidates.append(site)
+    return candidates
+
+
+class DomainMatcher:
+    """
+    预编译的域名匹配器
+
+    判断主机名是否等于目标域名或是其子域名（不会把 notyoutube.com
+    当作 youtube.com）；一次线性遍历即可从大量Cookie中过滤出相关的。
+    """
+
+    def __init__(self, domains):
+        self._trie = SuffixTrie(d for d in domains if normalize_host(d))
+
+    def matches(self, host):
+        return self._trie.longest(normalize_host(host))[0] > 0
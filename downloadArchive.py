@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import threading
+import time
+
+from appPaths import data_path
+from domainMatcher import host_from_url
+from infoCache import normalize_url
+
+ARCHIVE_FILE = "download_archive.db"  # 下载归档数据库文件（位于程序数据目录）
+
+_extractors_lock = threading.Lock()
+_EXTRACTORS = None  # 缓存的提取器类列表
+_host_extractors = {}  # 主机名 -> 在该主机上匹配过的提取器下标（按yt-dlp顺序）；空元组表示完整扫描过但没有匹配
+
+
+def _extractor_classes():
+    """延迟导入yt-dlp的提取器列表，排除会匹配任意URL的通用提取器"""
+    from yt_dlp.extractor import gen_extractor_classes
+    return [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+
+
+def _extractors():
+    global _EXTRACTORS
+    with _extractors_lock:
+        if _EXTRACTORS is None:
+            _EXTRACTORS = _extractor_classes()
+        return _EXTRACTORS
+
+
+def _warm_up():
+    # 各提取器的URL正则在第一次匹配时才编译，用一个不存在的URL全部编译一遍
+    for ie in _extractors():
+        _suitable(ie, 'https://example.invalid/')
+
+
+def preload_extractors():
+    """在后台线程中导入提取器列表并编译URL规则，第一次查询时不再阻塞界面"""
+    threading.Thread(target=_warm_up, name='extractor-preload', daemon=True).start()
+
+
+def _suitable(ie, url):
+    try:
+        return ie.suitable(url)
+    except Exception:
+        return False
+
+
+def _key(ie, url):
+    try:
+        video_id = ie.get_temp_id(url)
+    except Exception:
+        return None
+    return (ie.ie_key().lower(), str(video_id)) if video_id else None
+
+
+def key_for_url(url):
+    """
+    不联网地从URL推断 (提取器, 视频ID)
+
+    使用yt-dlp各提取器的URL规则匹配，无法识别时返回None。按主机名缓存
+    匹配结果：同一主机的URL先只尝试在该主机上匹配过的提取器，没有提取器
+    能识别的主机之后直接返回None，只有每个主机第一次出现时才遍历全部提取器。
+    推断失败只是少了入队前的快速判断，预检提取到视频信息后仍会按主键检查归档。
+    """
+    extractors = _extractors()
+    host = host_from_url(url)
+    with _extractors_lock:
+        known = _host_extractors.get(host)
+    if known is not None:
+        for index in known:
+            if _suitable(extractors[index], url):
+                return _key(extractors[index], url)
+        if not known:
+            return None
+
+    for index, ie in enumerate(extractors):
+        if _suitable(ie, url):
+            with _extractors_lock:
+                _host_extractors[host] = tuple(sorted(set(_host_extractors.get(host, ())) | {index}))
+            return _key(ie, url)
+    with _extractors_lock:
+        _host_extractors.setdefault(host, ())
+    return None
+
+
+def downloaded_filepath(info):
+    """从下载完成后的视频信息中取得最终输出文件路径"""
+    for download in info.get('requested_downloads') or []:
+        if download.get('filepath'):
+            return download['filepath']
+    return info.get('filepath') or info.get('_filename')
+
+
+class DownloadArchive:
+    """
+    已下载视频的持久化归档索引
+
+    记录 (提取器, 视频ID) -> 输出文件及大小，并维护规范化URL到视频的映射，
+    入队前按主键查询即可判断是否已下载；命中后只检查文件是否存在、
+    大小是否一致，文件已被删除或改动的记录会自动失效。
+
+    数据库在第一次查询或记录时才打开，导入模块不会创建文件。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self):
+        """首次访问时打开数据库并建表，调用方需持有self._lock"""
+        if self._db is None:
+            self._db = self._open(self.path or data_path(ARCHIVE_FILE))
+        return self._db
+
+    @staticmethod
+    def _open(path):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        with conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive (
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    filepath TEXT NOT NULL,
+                    filesize INTEGER NOT NULL,
+                    title TEXT,
+                    finished REAL NOT NULL,
+                    PRIMARY KEY (extractor, video_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive_urls (
+                    url TEXT PRIMARY KEY,
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_archive_urls_video ON archive_urls (extractor, video_id)'
+            )
+        return conn
+
+    def lookup(self, url):
+        """
+        按URL查找已下载且文件仍然有效的记录
+
+        Returns:
+            str: 已下载文件路径，未下载或文件失效时为None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT extractor, video_id FROM archive_urls WHERE url = ?',
+                (normalize_url(url),)
+            ).fetchone()
+        key = tuple(row) if row else key_for_url(url)
+        if key is None:
+            return None
+        return self.lookup_key(*key)
+
+    def lookup_key(self, extractor, video_id):
+        """
+        按 (提取器, 视频ID) 查找已下载且文件仍然有效的记录
+
+        Returns:
+            str: 已下载文件路径，未下载或文件失效时为None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT filepath, filesize FROM archive WHERE extractor = ? AND video_id = ?',
+                (extractor.lower(), str(video_id))
+            ).fetchone()
+        if row is None:
+            return None
+
+        filepath, filesize = row
+        try:
+            if os.path.getsize(filepath) == filesize:
+                return filepath
+        except OSError:
+            pass
+
+        # 文件已删除或被改动，记录失效
+        self.remove(extractor, video_id)
+        return None
+
+    def record(self, url, info):
+        """
+        记录一次成功的下载
+
+        Args:
+            url (str): 任务URL
+            info (dict): 下载完成后的视频信息
+        """
+        extractor = (info.get('extractor_key') or info.get('extractor') or '').lower()
+        video_id = info.get('id')
+        filepath = downloaded_filepath(info)
+        if not extractor or not video_id or not filepath:
+            return
+        try:
+            filesize = os.path.getsize(filepath)
+        except OSError:
+            return
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?, ?)',
+                (extractor, str(video_id), os.path.abspath(filepath), filesize,
+                 info.get('title'), time.time())
+            )
+            for source_url in {url, info.get('webpage_url'), info.get('original_url')}:
+                if source_url:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO archive_urls VALUES (?, ?, ?)',
+                        (normalize_url(source_url), extractor, str(video_id))
+                    )
+
+    def remove(self, extractor, video_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM archive WHERE extractor = ? AND video_id = ?',
+                (extractor.lower(), str(video_id))
+            )
+            self._conn.execute(
+                'DELETE FROM archive_urls WHERE extractor = ? AND video_id = ?',
+                (extractor.lower(), str(video_id))
+            )
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# 进程内共享的下载归档
+download_archive = DownloadArchive()
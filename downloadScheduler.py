@@ -0,0 +1,475 @@
+import itertools
+import os
+import time
+import uuid
+from collections import deque
+
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+
+from downloadWorker import (host_key_from_url, OUTCOME_RETRY, OUTCOME_PAUSED, OUTCOME_CANCELLED,
+                            OUTCOME_POSTPROCESS, STOP_PAUSE, STOP_CANCEL)
+
+DEFAULT_MAX_CONCURRENCY = 3  # 默认最大并发下载数
+MAX_CONCURRENCY_LIMIT = 16  # 并发数上限
+POSTPROCESS_CONCURRENCY = os.cpu_count() or 2  # 后处理（ffmpeg）并发数，按CPU核数
+
+HOST_INITIAL_BUDGET = 2  # 每个站点的初始并发预算
+HOST_GROWTH_THRESHOLD = 1.05  # 站点总吞吐量提升超过5%才增加预算
+HOST_DECREASE_FACTOR = 0.5  # 检测到限流时预算的缩减倍数
+HOST_THROTTLE_COOLDOWN = 10.0  # 两次缩减之间的最小间隔（秒）
+HOST_EVALUATE_INTERVAL = 5000  # 站点吞吐量评估间隔（毫秒）
+
+
+class DownloadJob:
+    """
+    单个下载任务的描述
+
+    保存任务参数、所在的任务表行以及执行任务的DownloadWorker，
+    由DownloadScheduler排队并分配到空闲的工作线程上执行。
+    """
+
+    _id_counter = itertools.count(1)
+
+    def __init__(self, url, folder, quality, cookie_file=None, row=None, journal_id=None):
+        self.job_id = next(self._id_counter)
+        self.journal_id = journal_id or uuid.uuid4().hex  # 任务日志中的持久ID
+        self.url = url
+        self.folder = folder
+        self.quality = quality
+        self.cookie_file = cookie_file
+        self.row = row
+        self.host = host_key_from_url(url)
+        self.worker = None
+        self.duplicate = False  # 预检阶段发现与批次中其他任务重复
+        self.attached = False  # 是否已连接调度器需要的worker信号
+        self.source = None  # 产生该任务的播放列表展开器，任务开始后归还其额度
+        self.sync_run = None  # 产生该任务的同步展开器，任务结束后决定是否推进高水位标记
+
+
+class HostConcurrencyController:
+    """
+    按站点的自适应并发预算（AIMD）
+
+    每个站点拥有独立的并发预算：当该站点的任务占满预算且总吞吐量
+    仍在上升时预算加一；检测到限流（HTTP 429/403或持续低速）时
+    预算按倍数缩减。该对象只在GUI线程中访问。
+    """
+
+    def __init__(self, maximum, initial=HOST_INITIAL_BUDGET):
+        self.maximum = maximum
+        self.initial = initial
+        self._budgets = {}  # 站点 -> 并发预算（浮点数，取整使用）
+        self._speeds = {}  # 站点 -> {job_id: 最近一次速度}
+        self._finished = {}  # 站点 -> 本轮评估后需要移除的job_id
+        self._last_throughput = {}  # 站点 -> 上一轮评估的总吞吐量
+        self._last_decrease = {}  # 站点 -> 上一次缩减的时间
+
+    def budget(self, host):
+        value = self._budgets.get(host, self.initial)
+        return max(1, min(int(value), self.maximum))
+
+    def record_speed(self, host, job_id, speed):
+        self._speeds.setdefault(host, {})[job_id] = speed
+
+    def finish_job(self, host, job_id):
+        # 保留最后一次速度参与本轮评估，评估后再移除
+        self._finished.setdefault(host, set()).add(job_id)
+
+    def on_throttled(self, host):
+        """
+        乘性减少：检测到限流时缩减预算
+
+        Returns:
+            bool: 预算是否发生变化
+        """
+        now = time.monotonic()
+        if now - self._last_decrease.get(host, 0.0) < HOST_THROTTLE_COOLDOWN:
+            return False
+        self._last_decrease[host] = now
+        before = self.budget(host)
+        current = min(self._budgets.get(host, self.initial), self.maximum)
+        self._budgets[host] = max(1.0, current * HOST_DECREASE_FACTOR)
+        # 限流后重新建立吞吐量基线
+        self._last_throughput.pop(host, None)
+        return self.budget(host) != before
+
+    def evaluate(self, host, in_flight):
+        """
+        加性增加：预算已占满且总吞吐量仍在上升时预算加一
+
+        Args:
+            host (str): 站点
+            in_flight (int): 该站点正在执行的任务数
+
+        Returns:
+            bool: 预算是否发生变化
+        """
+        speeds = self._speeds.get(host, {})
+        throughput = sum(speeds.values())
+        for job_id in self._finished.pop(host, ()):
+            speeds.pop(job_id, None)
+        if not speeds:
+            self._speeds.pop(host, None)
+
+        previous = self._last_throughput.get(host)
+        self._last_throughput[host] = throughput
+        if previous is None or in_flight < self.budget(host):
+            return False
+        if throughput > previous * HOST_GROWTH_THRESHOLD and self.budget(host) < self.maximum:
+            self._budgets[host] = self.budget(host) + 1.0
+            return True
+        return False
+
+
+class _SlotRunner(QObject):
+    """
+    常驻工作线程中的任务执行器
+
+    每个执行器绑定一个长期存在的QThread，收到任务后在该线程中
+    同步执行该阶段的方法（下载阶段为DownloadWorker.run，后处理阶段为
+    DownloadWorker.postprocess），完成后通知调度器释放槽位。
+    """
+
+    run_requested = pyqtSignal(object)
+    job_done = pyqtSignal(int)
+
+    def __init__(self, index, stage='run'):
+        super().__init__()
+        self.index = index
+        self.stage = stage
+
+    @pyqtSlot(object)
+    def run_job(self, job):
+        try:
+            getattr(job.worker, self.stage)()
+        finally:
+            self.job_done.emit(self.index)
+
+
+class DownloadScheduler(QObject):
+    """
+    下载任务调度器
+
+    使用先进先出的任务队列和固定数量的常驻工作线程执行下载，
+    超出最大并发数的任务保持等待状态，直到有槽位空闲。
+    每个站点另有自适应的并发预算，预算已满的站点的任务会让出槽位
+    给队列中其他站点的任务。任务可随时暂停、恢复或取消，
+    等待中的任务直接移出队列，运行中的任务在下一次进度回调时退出。
+
+    下载与后处理分为两个阶段：各个流下载完成后任务立即释放下载槽位，
+    经交接队列进入按CPU核数限制并发的后处理线程池执行ffmpeg合并，
+    下一个任务的下载与前一个任务的合并同时进行。
+    所有公开方法都应在GUI线程中调用。
+    """
+
+    job_started = pyqtSignal(object)
+    job_finished = pyqtSignal(object)
+    host_budget_changed = pyqtSignal(str, int)  # (站点, 新的并发预算)
+    job_retry_scheduled = pyqtSignal(object, float)  # (任务, 重试前等待秒数)
+    job_paused = pyqtSignal(object)
+    job_cancelled = pyqtSignal(object)
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, parent=None):
+        super().__init__(parent)
+        self._pending = deque()  # 等待执行的任务队列
+        self._slots = []  # [(QThread, _SlotRunner)]
+        self._running = {}  # 槽位索引 -> 正在执行的任务
+        self._host_in_flight = {}  # 站点 -> 正在执行的任务数
+        self._retrying = {}  # 等待重试延迟结束的任务 -> 其重试定时器
+        self._paused = {}  # job_id -> 已暂停的任务
+        self._max_concurrency = 1
+
+        # 后处理阶段：交接队列与独立的常驻线程
+        self._post_pending = deque()
+        self._post_slots = []
+        self._post_running = {}  # 后处理槽位索引 -> 正在合并的任务
+        self._post_concurrency = POSTPROCESS_CONCURRENCY
+        self._hosts = HostConcurrencyController(MAX_CONCURRENCY_LIMIT)
+
+        # 定期评估各站点吞吐量并调整并发预算
+        self._evaluate_timer = QTimer(self)
+        self._evaluate_timer.setInterval(HOST_EVALUATE_INTERVAL)
+        self._evaluate_timer.timeout.connect(self._evaluate_hosts)
+        self._evaluate_timer.start()
+
+        self.set_max_concurrency(max_concurrency)
+
+    def host_budget(self, host):
+        return self._hosts.budget(host)
+
+    def set_max_concurrency(self, value):
+        """
+        修改最大并发数
+
+        增大时按需创建新的常驻线程并立即调度等待中的任务；
+        减小时正在执行的任务不受影响，只是不再分配新任务。
+
+        Args:
+            value (int): 新的最大并发数
+        """
+        self._max_concurrency = max(1, min(int(value), MAX_CONCURRENCY_LIMIT))
+        self._hosts.maximum = self._max_concurrency
+        while len(self._slots) < self._max_concurrency:
+            self._create_slot()
+        self._dispatch()
+
+    def is_paused(self, job):
+        return job.job_id in self._paused
+
+    def submit(self, job):
+        """
+        提交任务到队列尾部
+
+        提交前已被请求暂停或取消的任务（例如仍在预检中）不会入队。
+
+        Args:
+            job (DownloadJob): 已绑定worker的下载任务
+        """
+        self._attach(job)
+        if job.worker.stop_request:
+            self._stopped(job, job.worker.stop_request)
+            return
+        self._pending.append(job)
+        self._dispatch()
+
+    def pause(self, job):
+        """
+        暂停任务，保留已下载的部分数据
+
+        Args:
+            job (DownloadJob): 下载任务
+        """
+        self._stop(job, STOP_PAUSE)
+
+    def cancel(self, job):
+        """
+        取消任务并删除已下载的部分数据
+
+        Args:
+            job (DownloadJob): 下载任务
+        """
+        self._stop(job, STOP_CANCEL)
+
+    def resume(self, job):
+        """
+        恢复已暂停的任务，重新排到队列尾部并从断点继续下载
+
+        Args:
+            job (DownloadJob): 下载任务
+
+        Returns:
+            bool: 任务是否处于暂停状态并已恢复
+        """
+        if self._paused.pop(job.job_id, None) is None:
+            return False
+        job.worker.clear_stop()
+        self.submit(job)
+        return True
+
+    def pause_all(self):
+        for job in self._active_jobs():
+            self.pause(job)
+
+    def cancel_all(self):
+        for job in self._active_jobs() + list(self._paused.values()):
+            self.cancel(job)
+
+    def resume_all(self):
+        for job in list(self._paused.values()):
+            self.resume(job)
+
+    def _active_jobs(self):
+        """运行中、等待中、等待重试和处于后处理阶段的任务"""
+        return (list(self._running.values()) + list(self._pending) + list(self._retrying)
+                + list(self._post_running.values()) + list(self._post_pending))
+
+    def _stop(self, job, mode):
+        if job.worker.stop_request == STOP_CANCEL:
+            return
+        if job in self._pending:
+            self._pending.remove(job)
+        elif job in self._post_pending:
+            self._post_pending.remove(job)
+        elif job in self._retrying:
+            self._cancel_retry(job)
+        elif job.job_id in self._paused:
+            if mode == STOP_PAUSE:
+                return
+            del self._paused[job.job_id]
+        elif job not in self._running.values() and job not in self._post_running.values():
+            # 尚未提交（如仍在预检中），提交时再处理
+            job.worker.request_stop(mode)
+            return
+        else:
+            # 运行中的任务在下一次进度回调时退出，由_on_job_done释放槽位
+            job.worker.request_stop(mode)
+            return
+
+        job.worker.request_stop(mode)
+        self._stopped(job, mode)
+
+    def _stopped(self, job, mode):
+        """任务已停止执行：暂停的任务保留待恢复，取消的任务清理临时文件"""
+        if mode == STOP_PAUSE:
+            job.worker.outcome = OUTCOME_PAUSED
+            self._paused[job.job_id] = job
+            self.job_paused.emit(job)
+        else:
+            job.worker.outcome = OUTCOME_CANCELLED
+            job.worker.remove_partial_files()
+            job.worker.cleanup()
+            self.job_cancelled.emit(job)
+
+    def shutdown(self, timeout=3000):
+        """
+        停止调度并退出所有工作线程
+
+        Args:
+            timeout (int): 等待每个线程退出的毫秒数
+        """
+        self._pending.clear()
+        self._post_pending.clear()
+        for job in list(self._retrying):
+            self._cancel_retry(job)
+        self._evaluate_timer.stop()
+        # 让运行中的下载与合并尽快退出，保留已下载的数据供下次启动时继续
+        for job in list(self._running.values()) + list(self._post_running.values()):
+            job.worker.request_stop(STOP_PAUSE)
+        slots = self._slots + self._post_slots
+        for thread, _ in slots:
+            thread.quit()
+        for thread, _ in slots:
+            thread.wait(timeout)
+
+    def _create_slot(self):
+        self._slots.append(self._start_runner(len(self._slots), 'run', self._on_job_done))
+
+    def _start_runner(self, index, stage, on_done):
+        thread = QThread()
+        runner = _SlotRunner(index, stage)
+        runner.moveToThread(thread)
+        # 跨线程连接：run_requested在GUI线程发出，run_job在工作线程执行
+        runner.run_requested.connect(runner.run_job)
+        runner.job_done.connect(on_done)
+        thread.start()
+        return thread, runner
+
+    def _attach(self, job):
+        """连接worker的速度与限流信号，每个任务只连接一次"""
+        if job.attached:
+            return
+        job.attached = True
+        job.worker.speed_signal.connect(
+            lambda speed, job=job: self._hosts.record_speed(job.host, job.job_id, speed)
+        )
+        job.worker.throttled_signal.connect(lambda msg, job=job: self._on_throttled(job))
+
+    def _on_throttled(self, job):
+        if self._hosts.on_throttled(job.host):
+            self.host_budget_changed.emit(job.host, self._hosts.budget(job.host))
+
+    def _evaluate_hosts(self):
+        changed = False
+        for host, in_flight in list(self._host_in_flight.items()):
+            if self._hosts.evaluate(host, in_flight):
+                changed = True
+                self.host_budget_changed.emit(host, self._hosts.budget(host))
+        if changed:
+            self._dispatch()
+
+    def _next_job(self):
+        """按先进先出顺序取出第一个所属站点仍有并发预算的任务"""
+        for position, job in enumerate(self._pending):
+            if self._host_in_flight.get(job.host, 0) < self._hosts.budget(job.host):
+                del self._pending[position]
+                return job
+        return None
+
+    def _idle_slot(self):
+        for index in range(len(self._slots)):
+            if index not in self._running:
+                return index
+        return None
+
+    def _dispatch(self):
+        while self._pending and len(self._running) < self._max_concurrency:
+            index = self._idle_slot()
+            if index is None:
+                break
+            job = self._next_job()
+            if job is None:
+                break
+            self._running[index] = job
+            self._host_in_flight[job.host] = self._host_in_flight.get(job.host, 0) + 1
+            self.job_started.emit(job)
+            self._slots[index][1].run_requested.emit(job)
+
+    @pyqtSlot(int)
+    def _on_job_done(self, index):
+        job = self._running.pop(index, None)
+        if job is not None:
+            remaining = self._host_in_flight.get(job.host, 1) - 1
+            if remaining > 0:
+                self._host_in_flight[job.host] = remaining
+            else:
+                self._host_in_flight.pop(job.host, None)
+            self._hosts.finish_job(job.host, job.job_id)
+            if job.worker.outcome == OUTCOME_POSTPROCESS:
+                self._post_pending.append(job)
+                self._dispatch_postprocess()
+            else:
+                self._emit_outcome(job)
+        self._dispatch()
+
+    def _emit_outcome(self, job):
+        outcome = job.worker.outcome
+        if outcome == OUTCOME_RETRY:
+            self._schedule_retry(job)
+        elif outcome == OUTCOME_PAUSED:
+            self._paused[job.job_id] = job
+            self.job_paused.emit(job)
+        elif outcome == OUTCOME_CANCELLED:
+            self.job_cancelled.emit(job)
+        else:
+            self.job_finished.emit(job)
+
+    def _dispatch_postprocess(self):
+        """把交接队列中的任务分配到空闲的后处理线程，线程按需创建"""
+        while self._post_pending and len(self._post_running) < self._post_concurrency:
+            index = next(i for i in range(self._post_concurrency) if i not in self._post_running)
+            if index == len(self._post_slots):
+                self._post_slots.append(self._start_runner(index, 'postprocess', self._on_postprocess_done))
+            job = self._post_pending.popleft()
+            self._post_running[index] = job
+            self._post_slots[index][1].run_requested.emit(job)
+
+    @pyqtSlot(int)
+    def _on_postprocess_done(self, index):
+        job = self._post_running.pop(index, None)
+        if job is not None:
+            self._emit_outcome(job)
+        self._dispatch_postprocess()
+
+    def _schedule_retry(self, job):
+        """退避期间任务不占用槽位，到时后重新进入队列尾部"""
+        delay = job.worker.retry_delay or 0
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self._resubmit(job, timer))
+        self._retrying[job] = timer
+        self.job_retry_scheduled.emit(job, delay)
+        timer.start(int(delay * 1000))
+
+    def _cancel_retry(self, job):
+        """停止任务的重试定时器（任务被暂停、取消或调度器关闭）"""
+        timer = self._retrying.pop(job)
+        timer.stop()
+        timer.deleteLater()
+
+    def _resubmit(self, job, timer):
+        # 只有任务当前的定时器才能重新提交；被暂停后再次重试时旧定时器已停止并替换
+        if self._retrying.get(job) is not timer:
+            return
+        del self._retrying[job]
+        timer.deleteLater()
+        self.submit(job)
@@ -1,10 +1,25 @@
+import glob
 import os
+import re
 import shutil
-import sqlite3
-import tempfile
+import time
+from http.cookiejar import LoadError
 
-import yt_dlp
 from PyQt5.QtCore import pyqtSignal, QObject
+from yt_dlp.utils import DownloadCancelled
+
+from bandwidthLimiter import bandwidth_limiter, MAX_SLEEP
+from browserCookieCache import browser_cookie_cache
+from cookieExtractor import probe_browsers, query_chrome_cookies, query_firefox_cookies
+from cookieJars import cookie_file_cache, CookieFileError
+from domainMatcher import site_from_url
+from downloadArchive import download_archive
+from ffmpegMuxer import can_stream, download_streams, ffmpeg_available, stream_and_mux
+from formatPlanner import plan_formats
+from fragmentTuner import fragment_tuner, HTTP_CHUNK_SIZE
+from infoCache import info_cache
+from retryPolicy import classify_error, retry_policy, ERROR_RATE_LIMITED
+from ydlSessionPool import session_pool
 
 try:
     import browser_cookie3
@@ -22,31 +37,39 @@ try:
 except ImportError:
     CRYPTO_AVAILABLE = False
 
+# 站点限流特征（HTTP 429/403、Too Many Requests等）
+THROTTLE_PATTERN = re.compile(r'HTTP Error (429|403)|Too Many Requests|rate[- ]?limit', re.IGNORECASE)
+THROTTLED_SPEED = 64 * 1024  # 低于该速度（字节/秒）视为被限速
+THROTTLED_DURATION = 15  # 持续低速多少秒后上报限速
+SPEED_REPORT_INTERVAL = 1.0  # 速度上报最小间隔（秒）
+
+# 单次执行（run）的结果，调度器据此决定释放、重新入队或结束任务
+OUTCOME_DONE = 'done'
+OUTCOME_RETRY = 'retry'
+OUTCOME_FAILED = 'failed'
+OUTCOME_PAUSED = 'paused'
+OUTCOME_CANCELLED = 'cancelled'
+OUTCOME_POSTPROCESS = 'postprocess'  # 下载完成，等待后处理线程池合并
+
+# 停止请求：暂停保留已下载的部分数据，取消则删除
+STOP_PAUSE = 'pause'
+STOP_CANCEL = 'cancel'
+
+# 下载链接已过期或失效的特征，出现时需要丢弃缓存的视频信息重新提取
+STALE_INFO_PATTERN = re.compile(r'HTTP Error (403|410)|expired', re.IGNORECASE)
+
 
 def _extract_domain_from_url(url):
-    """从URL中提取域名"""
-    try:
-        # 提取主域名
-        if 'youtube.com' in url or 'youtu.be' in url:
-            return ['youtube.com', '.youtube.com']
-        elif 'bilibili.com' in url:
-            return ['bilibili.com', '.bilibili.com']
-        elif 'twitter.com' in url or 'x.com' in url:
-            return ['twitter.com', '.twitter.com']
-        elif 'facebook.com' in url:
-            return ['facebook.com', '.facebook.com']
-        elif 'instagram.com' in url:
-            return ['instagram.com', '.instagram.com']
-        else:
-            # 尝试从URL提取通用域名
-            import urllib.parse
-            parsed = urllib.parse.urlparse(url)
-            domain = parsed.netloc
-            if domain:
-                return [domain, f'.{domain}']
-            return None
-    except:
+    """从URL中提取站点域名（短链接等别名映射到主站，如 youtu.be -> youtube.com）"""
+    site = site_from_url(url)
+    if not site:
         return None
+    return [site, f'.{site}']
+
+
+def host_key_from_url(url):
+    """从URL中提取用于按站点调度的主机键，如 youtube.com"""
+    return site_from_url(url)
 
 
 class DownloadWorker(QObject):
@@ -57,6 +80,11 @@ class DownloadWorker(QObject):
     error_signal = pyqtSignal(str)
     open_signal = pyqtSignal(str)
 
+    # 调度相关信号
+    speed_signal = pyqtSignal(float)  # 当前下载速度（字节/秒）
+    stage_signal = pyqtSignal(str)  # 任务阶段变化（extracting / downloading / post-processing）
+    throttled_signal = pyqtSignal(str)  # 检测到站点限流
+
     # Cookie相关信号
     cookie_info_signal = pyqtSignal(str)
     cookie_warning_signal = pyqtSignal(str)
@@ -70,18 +98,49 @@ class DownloadWorker(QObject):
         self.language = language if language in ['zh', 'en'] else 'zh'
         self.cookie_file = cookie_file
         self.quality = quality
-        self.temp_cookie_file = None
+        self._last_speed_report = 0.0
+        self._slow_since = None
+        self._throttle_reported = False
+        self._stage = None
+
+        # 下载准备状态（cookie与格式选项只解析一次，预检阶段与下载阶段共用）
+        self._prepared = False
+        self.cookie_path = None  # 上传的Cookie文件路径（浏览器Cookie时为None）
+        self.cookie_jar = None  # 交给YoutubeDL会话的共享Cookie jar
+        self.ydl_format = None
+        self.postprocessors = []
+        self.merge_format = None
+        self.info = None  # 预检阶段提取到的视频信息
+        self.plan = None  # 根据可用格式规划的下载方案（FormatPlan）
+
+        # 重试状态：每次run只尝试一次，失败后由调度器按retry_delay延迟重新入队
+        self.attempt = 0
+        self.outcome = None
+        self.retry_delay = None
+        self.error_class = None
+
+        # 停止请求由GUI线程写入，下载线程在进度回调中检查
+        self.stop_request = None
+        self._partial_files = set()  # 本任务产生的临时文件，取消时删除
+        self.host = host_key_from_url(url)
+        self._fragments = 0  # 当前分配到的并行分段数
+        self._fragment_files = set()  # 以分段方式下载的文件
+        self._ydl = None  # 下载期间借用的YoutubeDL实例
+
+        # 下载阶段完成后交给后处理线程池的ffmpeg任务
+        self.mux_task = None
+        self._result = None
+
+        # 流式合并：ffmpeg直接读取流地址，边下载边写入最终文件（由GUI设置）
+        self.stream_mux = False
+        self._stream_sample = None  # (时间, 已写入字节数)，用于计算流式合并的速度
 
     def _tr(self, zh, en):
         return zh if self.language == 'zh' else en
 
     def _get_chrome_cookie_manually(self):
-        """手动获取Chrome Cookie（绕过加密问题）"""
+        """手动获取Chrome Cookie（绕过加密问题），返回共享的Cookie jar"""
         try:
-            import winreg
-            import shutil
-            import tempfile
-
             # Chrome Cookie数据库路径
             chrome_paths = [
                 os.path.join(os.environ['LOCALAPPDATA'], 'Google', 'Chrome', 'User Data', 'Default', 'Cookies'),
@@ -98,82 +157,23 @@ class DownloadWorker(QObject):
             if not cookie_db_path:
                 return None
 
-            # 复制数据库文件
-            temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
-            temp_db.close()
-            shutil.copy2(cookie_db_path, temp_db.name)
-
-            # 连接到SQLite数据库
-            conn = sqlite3.connect(temp_db.name)
-            cursor = conn.cursor()
-
             # 获取域列表
             domains = _extract_domain_from_url(self.url)
             if not domains:
                 return None
 
-            # 查询相关cookie
-            cookies = []
-            for domain in domains:
-                cursor.execute('''
-                    SELECT host_key, path, secure, expires_utc, name, value, encrypted_value
-                    FROM cookies 
-                    WHERE host_key LIKE ? OR host_key LIKE ?
-                ''', (domain, f'%{domain}'))
-
-                for row in cursor.fetchall():
-                    host_key, path, secure, expires_utc, name, value, encrypted_value = row
-
-                    # 如果value为空但encrypted_value不为空，尝试解密
-                    cookie_value = value
-                    if not value and encrypted_value:
-                        try:
-                            # 加密则使用yt-dlp chrome此处无法解密 建议使手动上传cookie或者自行优化
-                            continue
-                        except:
-                            continue
-
-                    cookies.append({
-                        'domain': host_key,
-                        'path': path,
-                        'secure': bool(secure),
-                        'expires': expires_utc,
-                        'name': name,
-                        'value': cookie_value
-                    })
-
-            conn.close()
-            os.unlink(temp_db.name)
-
-            if cookies:
-                # 创建临时cookie文件
-                self.temp_cookie_file = tempfile.NamedTemporaryFile(
-                    mode='w',
-                    suffix='.txt',
-                    delete=False,
-                    encoding='utf-8'
-                )
-
-                # Netscape格式
-                self.temp_cookie_file.write("# Netscape HTTP Cookie File\n")
-                for cookie in cookies:
-                    domain = cookie['domain']
-                    if domain.startswith('.'):
-                        domain = domain[1:]
-
-                    line = f"{domain}\tTRUE\t{cookie['path']}\t{str(cookie['secure']).upper()}\t{cookie['expires']}\t{cookie['name']}\t{cookie['value']}\n"
-                    self.temp_cookie_file.write(line)
-
-                self.temp_cookie_file.close()
-                return self.temp_cookie_file.name
-
-            return None
+            # 同一配置与域名的Cookie在进程内只提取一次
+            cookie_jar = browser_cookie_cache.get(
+                cookie_db_path, domains, lambda: query_chrome_cookies(cookie_db_path, domains),
+                source=cookie_db_path
+            )
+            return cookie_jar if cookie_jar else None
 
         except Exception as e:
             return None
 
     def _get_firefox_cookies_manually(self):
-        """手动获取Firefox Cookie（通常没有加密问题）"""
+        """手动获取Firefox Cookie（通常没有加密问题），返回共享的Cookie jar"""
         try:
             # Firefox配置文件路径
             firefox_paths = [
@@ -208,72 +208,22 @@ class DownloadWorker(QObject):
             latest_profile = profiles[0][0]
             cookie_db = os.path.join(latest_profile, 'cookies.sqlite')
 
-            # 复制数据库文件
-            temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
-            temp_db.close()
-            shutil.copy2(cookie_db, temp_db.name)
-
-            # 连接到SQLite数据库
-            conn = sqlite3.connect(temp_db.name)
-            cursor = conn.cursor()
-
             # 获取域列表
             domains = _extract_domain_from_url(self.url)
             if not domains:
                 return None
 
-            # 查询相关cookie
-            cookies = []
-            for domain in domains:
-                cursor.execute('''
-                    SELECT host, path, isSecure, expiry, name, value
-                    FROM moz_cookies 
-                    WHERE host LIKE ? OR host LIKE ?
-                ''', (domain, f'%{domain}'))
-
-                for row in cursor.fetchall():
-                    host, path, isSecure, expiry, name, value = row
-                    cookies.append({
-                        'domain': host,
-                        'path': path,
-                        'secure': bool(isSecure),
-                        'expires': expiry,
-                        'name': name,
-                        'value': value
-                    })
-
-            conn.close()
-            os.unlink(temp_db.name)
-
-            if cookies:
-                # 创建临时cookie文件
-                self.temp_cookie_file = tempfile.NamedTemporaryFile(
-                    mode='w',
-                    suffix='.txt',
-                    delete=False,
-                    encoding='utf-8'
-                )
-
-                # Netscape格式
-                self.temp_cookie_file.write("# Netscape HTTP Cookie File\n")
-                for cookie in cookies:
-                    domain = cookie['domain']
-                    if domain.startswith('.'):
-                        domain = domain[1:]
-
-                    line = f"{domain}\tTRUE\t{cookie['path']}\t{str(cookie['secure']).upper()}\t{cookie['expires']}\t{cookie['name']}\t{cookie['value']}\n"
-                    self.temp_cookie_file.write(line)
-
-                self.temp_cookie_file.close()
-                return self.temp_cookie_file.name
-
-            return None
+            # 同一配置与域名的Cookie在进程内只提取一次
+            cookie_jar = browser_cookie_cache.get(
+                cookie_db, domains, lambda: query_firefox_cookies(cookie_db, domains), source=cookie_db
+            )
+            return cookie_jar if cookie_jar else None
 
         except Exception as e:
             return None
 
     def _get_browser_cookies(self):
-        """尝试从浏览器获取cookie（改进版）"""
+        """尝试从浏览器获取cookie（改进版），返回共享的Cookie jar"""
         if not BROWSER_COOKIE_AVAILABLE:
             self.cookie_error_signal.emit(
                 self._tr("未安装browser_cookie3库，无法自动获取浏览器Cookie",
@@ -306,7 +256,7 @@ class DownloadWorker(QObject):
         except Exception as e:
             pass
 
-        # 然后尝试标准方法
+        # 然后并行探测各浏览器（上次成功的浏览器优先）
         try:
             browsers = [
                 ('Firefox', browser_cookie3.firefox),
@@ -316,95 +266,40 @@ class DownloadWorker(QObject):
                 ('Brave', browser_cookie3.brave),
             ]
 
-            tried_browsers = []
+            self.cookie_info_signal.emit(
+                self._tr(f"同时尝试从 {', '.join(name for name, _ in browsers)} 获取Cookie...",
+                         f"Trying to get cookies from {', '.join(name for name, _ in browsers)} in parallel...")
+            )
+            browser_name, cookie_jar, failures = probe_browsers(browsers, domain)
+            if browser_name is not None:
+                self.cookie_success_signal.emit(
+                    self._tr(f"✅ 成功从 {browser_name} 获取 {len(cookie_jar)} 个Cookie",
+                             f"✅ Successfully got {len(cookie_jar)} cookies from {browser_name}")
+                )
+                return cookie_jar
 
-            for browser_name, browser_func in browsers:
-                try:
+            tried_browsers = list(failures)
+            for browser_name, error in failures.items():
+                error_msg = str(error or '')
+                if error is None:
                     self.cookie_info_signal.emit(
-                        self._tr(f"尝试从 {browser_name} 获取Cookie...",
-                                 f"Trying to get cookies from {browser_name}...")
+                        self._tr(f"从 {browser_name} 未找到相关Cookie",
+                                 f"No relevant cookies found in {browser_name}")
+                    )
+                elif isinstance(error, TimeoutError):
+                    self.cookie_info_signal.emit(
+                        self._tr(f"{browser_name} 获取超时", f"{browser_name} timed out")
+                    )
+                elif "decryption" in error_msg.lower() or "encryption" in error_msg.lower():
+                    self.cookie_info_signal.emit(
+                        self._tr(f"⚠️ {browser_name} Cookie加密，无法自动解密",
+                                 f"⚠️ {browser_name} cookies are encrypted, cannot auto-decrypt")
+                    )
+                else:
+                    self.cookie_info_signal.emit(
+                        self._tr(f"{browser_name} 获取失败: {error_msg[:100]}",
+                                 f"{browser_name} fetch failed: {error_msg[:100]}")
                     )
-
-                    tried_browsers.append(browser_name)
-
-                    # 尝试获取所有cookie，然后过滤
-                    cookies = browser_func()
-
-                    if cookies:
-                        # 过滤相关域名的cookie
-                        filtered_cookies = []
-                        for cookie in cookies:
-                            cookie_domain = getattr(cookie, 'domain', '')
-                            for d in domain:
-                                if d in cookie_domain:
-                                    filtered_cookies.append(cookie)
-                                    break
-
-                        if filtered_cookies:
-                            # 创建临时cookie文件
-                            self.temp_cookie_file = tempfile.NamedTemporaryFile(
-                                mode='w',
-                                suffix='.txt',
-                                delete=False,
-                                encoding='utf-8'
-                            )
-
-                            # Netscape格式
-                            self.temp_cookie_file.write("# Netscape HTTP Cookie File\n")
-
-                            cookie_count = 0
-                            for cookie in filtered_cookies:
-                                try:
-                                    cookie_domain = getattr(cookie, 'domain', '')
-                                    cookie_path = getattr(cookie, 'path', '/')
-                                    cookie_secure = getattr(cookie, 'secure', False)
-                                    cookie_expires = getattr(cookie, 'expires', 0)
-                                    cookie_name = getattr(cookie, 'name', '')
-                                    cookie_value = getattr(cookie, 'value', '')
-
-                                    if not cookie_name or not cookie_value:
-                                        continue
-
-                                    # 处理域名
-                                    if cookie_domain.startswith('.'):
-                                        cookie_domain = cookie_domain[1:]
-
-                                    line = f"{cookie_domain}\tTRUE\t{cookie_path}\t{'TRUE' if cookie_secure else 'FALSE'}\t{cookie_expires or 0}\t{cookie_name}\t{cookie_value}\n"
-                                    self.temp_cookie_file.write(line)
-                                    cookie_count += 1
-
-                                except Exception as e:
-                                    continue
-
-                            self.temp_cookie_file.close()
-
-                            if cookie_count > 0:
-                                self.cookie_success_signal.emit(
-                                    self._tr(f"✅ 成功从 {browser_name} 获取 {cookie_count} 个Cookie",
-                                             f"✅ Successfully got {cookie_count} cookies from {browser_name}")
-                                )
-                                return self.temp_cookie_file.name
-                            else:
-                                os.unlink(self.temp_cookie_file.name)
-                                self.temp_cookie_file = None
-                                self.cookie_info_signal.emit(
-                                    self._tr(f"从 {browser_name} 未找到相关Cookie",
-                                             f"No relevant cookies found in {browser_name}")
-                                )
-
-                except Exception as e:
-                    error_msg = str(e)
-                    if "decryption" in error_msg.lower() or "encryption" in error_msg.lower():
-                        self.cookie_info_signal.emit(
-                            self._tr(f"⚠️ {browser_name} Cookie加密，无法自动解密",
-                                     f"⚠️ {browser_name} cookies are encrypted, cannot auto-decrypt")
-                        )
-                    else:
-                        self.cookie_info_signal.emit(
-                            self._tr(f"{browser_name} 获取失败: {error_msg[:100]}",
-                                     f"{browser_name} fetch failed: {error_msg[:100]}")
-                        )
-                    continue
 
             # 如果所有浏览器都失败了
             if tried_browsers:
@@ -426,29 +321,101 @@ class DownloadWorker(QObject):
             )
             return None
 
-    def _cleanup_temp_cookie(self):
-        """清理临时cookie文件"""
-        if self.temp_cookie_file and os.path.exists(self.temp_cookie_file.name):
-            try:
-                os.unlink(self.temp_cookie_file.name)
-                self.temp_cookie_file = None
-            except:
-                pass
-
-    def run(self):
-        self.status_signal.emit(self._tr("开始下载...", "Starting download..."))
-        self.log_signal.emit(self._tr("开始下载: ", "Starting: ") + self.url)
+    def _set_stage(self, stage):
+        """阶段变化时发出stage_signal"""
+        if stage != self._stage:
+            self._stage = stage
+            self.stage_signal.emit(stage)
+
+    def _report_throttle(self, msg):
+        """检测消息中的限流特征，每个任务只上报一次"""
+        if self._throttle_reported or not THROTTLE_PATTERN.search(msg or ''):
+            return
+        self._throttle_reported = True
+        fragment_tuner.on_throttled(self.host)
+        self.throttled_signal.emit(msg)
+
+    def _track_speed(self, speed):
+        """上报下载速度，并在持续低速时视为被限速"""
+        now = time.monotonic()
+        if now - self._last_speed_report >= SPEED_REPORT_INTERVAL:
+            self._last_speed_report = now
+            self.speed_signal.emit(float(speed))
+
+        if speed < THROTTLED_SPEED:
+            if self._slow_since is None:
+                self._slow_since = now
+            elif now - self._slow_since >= THROTTLED_DURATION and not self._throttle_reported:
+                self._throttle_reported = True
+                fragment_tuner.on_throttled(self.host)
+                self.throttled_signal.emit(
+                    self._tr(f"下载速度持续低于 {THROTTLED_SPEED // 1024}KB/s",
+                             f"Speed stayed below {THROTTLED_SPEED // 1024}KB/s")
+                )
+        else:
+            self._slow_since = None
+
+    def _limit_bandwidth(self, d):
+        """向共享的带宽限制器上报新下载的字节数，并按需等待"""
+        if not bandwidth_limiter.active:
+            return
+        key = d.get('tmpfilename') or d.get('filename')
+        delay = bandwidth_limiter.report(id(self), key, d.get('downloaded_bytes') or 0, self.host)
+        # 分段等待，等待期间也能及时响应暂停/取消
+        while delay > 0:
+            time.sleep(min(delay, MAX_SLEEP))
+            delay -= MAX_SLEEP
+            self._check_stop()
+
+    def _tune_fragments(self, d):
+        """分段格式下载完成后按实测吞吐量调整分段数，作用于下一个格式"""
+        elapsed = d.get('elapsed')
+        size = d.get('total_bytes') or d.get('downloaded_bytes')
+        if not elapsed or not size or not self._fragments:
+            return
+        fragment_tuner.record(self.host, self._fragments, size / elapsed)
+
+        # 重新申请分段数；分离的音视频流下载器创建时读取 ydl.params
+        fragment_tuner.release(self._fragments)
+        self._fragments = fragment_tuner.acquire(self.host)
+        if self._ydl is not None:
+            self._ydl.params['concurrent_fragment_downloads'] = self._fragments
+
+    def cleanup(self):
+        """任务不再执行时释放对共享Cookie jar的引用和带宽限制器中的上报记录"""
+        self.cookie_jar = None
+        bandwidth_limiter.forget(id(self))
+
+    def _prepare(self):
+        """
+        确定cookie文件和格式选项，每个任务只成功执行一次
+
+        Raises:
+            CookieFileError: 上传的Cookie文件无法读取或格式不正确
+        """
+        if self._prepared:
+            return
 
         # 显示选择的清晰度
         self.log_signal.emit(self._tr(f"选择的清晰度: {self.quality}", f"Selected quality: {self.quality}"))
 
-        # 确定使用的cookie文件
+        # 确定使用的cookie（上传的文件与浏览器Cookie都解析为内存中的Cookie jar）
         cookie_path = None
+        cookie_jar = None
         cookie_source = self._tr("无Cookie", "No Cookie")
 
         if self.cookie_file and os.path.exists(self.cookie_file):
             # 使用用户上传的cookie文件
             cookie_path = self.cookie_file
+            # 同一文件只解析一次，修改后重新解析
+            try:
+                cookie_jar = cookie_file_cache.load(cookie_path)
+            except (LoadError, OSError) as e:
+                name = os.path.basename(self.cookie_file)
+                message = self._tr(f"❌ Cookie文件无法读取: {name}（{e}）",
+                                   f"❌ Cannot read cookie file: {name} ({e})")
+                self.cookie_error_signal.emit(message)
+                raise CookieFileError(message) from e
             cookie_source = self._tr(f"上传的Cookie文件: {os.path.basename(self.cookie_file)}",
                                      f"Uploaded cookie file: {os.path.basename(self.cookie_file)}")
             self.cookie_info_signal.emit(
@@ -461,9 +428,8 @@ class DownloadWorker(QObject):
                 self._tr("正在尝试自动获取浏览器Cookie...",
                          "Trying to auto-get browser cookies...")
             )
-            browser_cookie_path = self._get_browser_cookies()
-            if browser_cookie_path:
-                cookie_path = browser_cookie_path
+            cookie_jar = self._get_browser_cookies()
+            if cookie_jar is not None:
                 cookie_source = self._tr("自动获取的浏览器Cookie", "Auto-got browser cookies")
             else:
                 self.cookie_warning_signal.emit(
@@ -535,80 +501,363 @@ class DownloadWorker(QObject):
             postprocessors = []
             merge_format = None
 
-        # 设置重试次数
-        max_retries = 1
-        retry_count = 0
-        download_successful = False
+        self.cookie_path = cookie_path
+        self.cookie_jar = cookie_jar
+        self.ydl_format = ydl_format
+        self.postprocessors = postprocessors
+        self.merge_format = merge_format
+        self._prepared = True
+
+    def _build_ydl_opts(self):
+        """根据准备好的格式与cookie构建YoutubeDL选项"""
+        ydl_opts = {
+            'format': self.ydl_format,
+            'outtmpl': os.path.join(self.folder, '%(title)s.%(ext)s'),
+            'noplaylist': True,
+            'quiet': True,
+            'postprocessors': self.postprocessors,
+            'merge_output_format': self.merge_format,
+            'prefer_ffmpeg': True,
+            'http_chunk_size': HTTP_CHUNK_SIZE,
+            'postprocessor_args': ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
+        }
+        return ydl_opts
+
+    def _cookie_identity(self):
+        """返回用于信息缓存键的cookie身份（上传文件包含修改时间）"""
+        if self.cookie_jar is None:
+            return ''
+        if not self.cookie_path:
+            return 'browser'
+        try:
+            return f"{self.cookie_path}:{os.path.getmtime(self.cookie_path)}"
+        except OSError:
+            return self.cookie_path
+
+    def _info_cache_key(self):
+        return info_cache.make_key(self.url, self._cookie_identity(), self.ydl_format)
+
+    def _extract_info(self, ydl):
+        """优先从磁盘缓存读取视频信息，未命中时提取并写入缓存，然后规划下载格式"""
+        key = self._info_cache_key()
+        info = info_cache.get(key)
+        if info is not None:
+            self.log_signal.emit(self._tr("✅ 使用缓存的视频信息", "✅ Using cached video info"))
+        else:
+            info = ydl.sanitize_info(ydl.extract_info(self.url, download=False))
+            info_cache.put(key, info)
+        self._plan_formats(info)
+        return info
+
+    def _plan_formats(self, info):
+        """按可用格式选择无需转码的组合，规划失败时沿用清晰度对应的格式字符串"""
+        self.plan = plan_formats(info, self.quality, can_merge=self.merge_format is not None)
+        if self.plan is None:
+            return
+        if self.plan.needs_reencode:
+            note = self._tr("⚠️ 需要转码", "⚠️ re-encode required")
+        else:
+            note = self._tr("无需转码", "no re-encode")
+        self.log_signal.emit(self._tr(f"📋 格式方案: {self.plan.describe()}，{note}",
+                                      f"📋 Format plan: {self.plan.describe()}, {note}"))
+
+    def _use_fused_mux(self, ydl):
+        """视频流可直接复制进mp4时使用单次ffmpeg后处理，否则沿用yt-dlp的后处理链"""
+        return (self.plan is not None and not self.plan.reencode_video
+                and self.merge_format is not None and ffmpeg_available(ydl))
+
+    def _use_stream_mux(self, ydl):
+        """
+        开启流式合并且所有流都是HTTP直链时边下载边合并
+
+        限速时ffmpeg的读取不经过带宽限制器，回退到先下载后合并。
+        """
+        if not self.stream_mux or not self._use_fused_mux(ydl) or not can_stream(self.plan):
+            return False
+        if bandwidth_limiter.active:
+            self.log_signal.emit(self._tr("已开启限速，改为先下载后合并",
+                                          "Rate limit active, downloading before merging"))
+            return False
+        return True
+
+    def _on_stream_progress(self, progress):
+        """按ffmpeg已写入的时长与字节数上报流式合并的进度和速度"""
+        duration = (self.info or {}).get('duration')
+        out_time = progress.get('out_time_us', '')
+        if duration and out_time.isdigit():
+            percent = min(100, int(int(out_time) / 1000000 * 100 / duration))
+            self.progress_signal.emit(percent)
+            self.status_signal.emit(self._tr(f"边下载边合并：{percent}%", f"Streaming merge: {percent}%"))
+
+        size = progress.get('total_size', '')
+        if size.isdigit():
+            now = time.monotonic()
+            if self._stream_sample is not None and now > self._stream_sample[0]:
+                self._track_speed((int(size) - self._stream_sample[1]) / (now - self._stream_sample[0]))
+            self._stream_sample = (now, int(size))
+
+    def _apply_plan(self, ydl):
+        """
+        将格式方案应用到借用的会话，返回恢复函数
+
+        用方案中的格式ID替换会话的格式选择器；音频已兼容mp4时合并只复制流。
+        """
+        if self.plan is None:
+            return lambda: None
+        default_selector = ydl.format_selector
+        ydl.format_selector = ydl.build_format_selector(self.plan.format_spec)
+        ydl.params['postprocessor_args'] = self.plan.postprocessor_args
+
+        def restore():
+            ydl.format_selector = default_selector
+        return restore
+
+    def probe(self):
+        """
+        预检：只提取视频信息不下载
+
+        提取结果保存在self.info中，下载阶段直接基于该信息下载而不再重新提取。
+        失败时抛出异常。
+
+        Returns:
+            dict: 经过sanitize的视频信息
+        """
+        self.status_signal.emit(self._tr("解析中...", "Resolving..."))
+        self._set_stage('extracting')
+        self._prepare()
+        with session_pool.session(self._build_ydl_opts(), None, self.YTDLogger(self),
+                                  cookiejar=self.cookie_jar) as ydl:
+            self.info = self._extract_info(ydl)
+        self.status_signal.emit(self._tr("等待下载", "Waiting"))
+        return self.info
 
-        while retry_count <= max_retries and not download_successful:
-            try:
-                if retry_count > 0:
-                    self.log_signal.emit(self._tr(f"第{retry_count}次重试下载...", f"Retry {retry_count} download..."))
-                    self.status_signal.emit(self._tr(f"重试下载中...", "Retrying download..."))
-
-                ydl_opts = {
-                    'format': ydl_format,
-                    'outtmpl': os.path.join(self.folder, '%(title)s.%(ext)s'),
-                    'noplaylist': True,
-                    'quiet': True,
-                    'progress_hooks': [self.yt_hook],
-                    'logger': self.YTDLogger(self),
-                    'postprocessors': postprocessors,
-                    'merge_output_format': merge_format,
-                    'prefer_ffmpeg': True,
-                    'postprocessor_args': ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
-                }
-
-                # 添加cookie选项（如果可用）
-                if cookie_path:
-                    ydl_opts['cookiefile'] = cookie_path
-                    if retry_count == 0:  # 只在第一次显示
-                        self.log_signal.emit(self._tr(f"✅ 使用Cookie文件: {cookie_path}",
-                                                      f"✅ Using cookie file: {cookie_path}"))
-
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([self.url])
-
-                download_successful = True
+    def run(self):
+        """
+        执行一次下载尝试
+
+        失败时不在工作线程中等待：按错误类别计算退避时间写入retry_delay，
+        并将outcome置为OUTCOME_RETRY，由调度器延迟后重新入队；
+        永久错误或重试次数用完时置为OUTCOME_FAILED。
+        """
+        self._slow_since = None
+        self._throttle_reported = False
+        self.outcome = None
+        self.retry_delay = None
+        self._stage = None
+        bandwidth_limiter.forget(id(self))
+        self._fragment_files.clear()
+        self.mux_task = None
+
+        if self.attempt > 0:
+            self.log_signal.emit(self._tr(f"第{self.attempt}次重试下载...", f"Retry {self.attempt} download..."))
+            self.status_signal.emit(self._tr(f"重试下载中...", "Retrying download..."))
+        else:
+            self.status_signal.emit(self._tr("开始下载...", "Starting download..."))
+            self.log_signal.emit(self._tr("开始下载: ", "Starting: ") + self.url)
+
+        try:
+            self._prepare()
+            cookie_path = self.cookie_path
+            ydl_opts = self._build_ydl_opts()
+
+            if cookie_path:
+                if self.attempt == 0:  # 只在第一次显示
+                    self.log_signal.emit(self._tr(f"✅ 使用Cookie文件: {cookie_path}",
+                                                  f"✅ Using cookie file: {cookie_path}"))
+
+            # 分段格式的并行分段数按站点实测吞吐量调整，受全局预算约束
+            self._fragments = fragment_tuner.acquire(self.host)
+
+            # 从会话池借用YoutubeDL实例，复用提取器和HTTP连接；
+            # 共享的Cookie jar直接交给会话，无需写入和解析临时cookie文件
+            with session_pool.session(ydl_opts, self.yt_hook, self.YTDLogger(self),
+                                      cookiejar=self.cookie_jar,
+                                      overrides={'concurrent_fragment_downloads': self._fragments,
+                                                 'postprocessor_args': ydl_opts['postprocessor_args']}) as ydl:
+                self._ydl = ydl
+                # 预检阶段或缓存中已有信息时直接下载，不再重新提取
+                if self.info is None:
+                    self._set_stage('extracting')
+                    self.info = self._extract_info(ydl)
+                self._check_stop()
+                restore_format = self._apply_plan(ydl)
+                try:
+                    if self._use_stream_mux(ydl):
+                        self._set_stage('downloading')
+                        self._stream_sample = None
+                        result = stream_and_mux(ydl, self.info, self.plan, self._check_stop,
+                                                self._on_stream_progress)
+                    elif self._use_fused_mux(ydl):
+                        # 只下载各个流，合并、字幕、元数据和容器转换由后处理线程池一次完成
+                        result, self.mux_task = download_streams(ydl, self.info, self.plan)
+                    else:
+                        result = ydl.process_ie_result(self.info, download=True)
+                finally:
+                    restore_format()
+
+            if self.mux_task is not None:
+                # 释放下载槽位，由调度器交给后处理线程池
+                self._result = result
+                self.outcome = OUTCOME_POSTPROCESS
+                self._set_stage('post-processing')
                 self.progress_signal.emit(100)
-                self.status_signal.emit(self._tr("下载完成！", "Download complete!"))
-                self.log_signal.emit(self._tr("下载成功！", "Downloaded successfully!"))
-                self.open_signal.emit(self.folder)
-                self.finished_signal.emit()
-
-            except Exception as e:
-                error_message = str(e)
-                retry_count += 1
-
-                if retry_count <= max_retries:
-                    # 如果还有重试机会
-                    self.log_signal.emit(self._tr(f"下载失败，准备重试: {error_message[:100]}",
-                                                  f"Download failed, preparing to retry: {error_message[:100]}"))
-                    self.status_signal.emit(self._tr("等待重试...", "Waiting to retry..."))
-                    # 添加短暂延迟，避免立即重试
-                    import time
-                    time.sleep(2)  # 等待2秒再重试
-                else:
-                    # 重试次数用完，仍然失败
-                    self.error_signal.emit(error_message)
-                    self.log_signal.emit(self._tr(f"下载失败，已重试{max_retries}次: {error_message}",
-                                                  f"Download failed after {max_retries} retries: {error_message}"))
-                    self.status_signal.emit(self._tr("下载失败！", "Download failed!"))
-            finally:
-                # 只有最终完成时才清理临时cookie文件
-                if retry_count > max_retries or download_successful:
-                    self._cleanup_temp_cookie()
+                self.status_signal.emit(self._tr("等待合并...", "Waiting to merge..."))
+            else:
+                self._complete(result)
+
+        except DownloadCancelled:
+            self._handle_stop()
+
+        except Exception as e:
+            if self.stop_request:
+                # 停止请求期间出现的错误（如连接被中断）按停止处理
+                self._handle_stop()
+            else:
+                self._handle_failure(e)
+
+        finally:
+            self._ydl = None
+            if self._fragments:
+                fragment_tuner.release(self._fragments)
+                self._fragments = 0
+
+    def postprocess(self):
+        """
+        执行下载阶段留下的ffmpeg后处理（在调度器的后处理线程中调用）
+
+        暂停或失败重试时任务重新进入下载队列，已下载完成的分离流文件
+        会被yt-dlp直接跳过，随即再次交给后处理线程池。
+        """
+        self.outcome = None
+        self.status_signal.emit(self._tr("合并音视频中...", "Merging video and audio..."))
+        self.log_signal.emit(self._tr("合并音视频中...", "Merging video and audio..."))
+        try:
+            self._check_stop()
+            self.mux_task.run(self._check_stop)
+            self.mux_task = None
+            self._complete(self._result)
+
+        except DownloadCancelled:
+            self._handle_stop()
+
+        except Exception as e:
+            if self.stop_request:
+                self._handle_stop()
+            else:
+                self._handle_failure(e)
+
+    def _complete(self, result):
+        # 记录到下载归档，之后重复提交的同一视频会在入队前被跳过
+        if result:
+            download_archive.record(self.url, result)
+
+        self.outcome = OUTCOME_DONE
+        self.progress_signal.emit(100)
+        self.status_signal.emit(self._tr("下载完成！", "Download complete!"))
+        self.log_signal.emit(self._tr("下载成功！", "Downloaded successfully!"))
+        self.open_signal.emit(self.folder)
+        self.finished_signal.emit()
+
+    def request_stop(self, mode):
+        """
+        请求停止正在执行的下载（可在任意线程调用）
+
+        下载线程在下一次进度回调时抛出DownloadCancelled退出，
+        调度器随即释放槽位。
+
+        Args:
+            mode (str): STOP_PAUSE 或 STOP_CANCEL
+        """
+        self.stop_request = mode
+
+    def clear_stop(self):
+        """恢复任务前清除停止请求"""
+        self.stop_request = None
+
+    def _check_stop(self):
+        if self.stop_request:
+            raise DownloadCancelled(self.stop_request)
+
+    def _handle_stop(self):
+        if self.stop_request == STOP_PAUSE:
+            # 保留 .part 文件，恢复后yt-dlp从断点继续下载
+            self.outcome = OUTCOME_PAUSED
+            self.status_signal.emit(self._tr("已暂停", "Paused"))
+            self.log_signal.emit(self._tr("已暂停: ", "Paused: ") + self.url)
+        else:
+            self.outcome = OUTCOME_CANCELLED
+            self.remove_partial_files()
+            self.status_signal.emit(self._tr("已取消", "Cancelled"))
+            self.log_signal.emit(self._tr("已取消: ", "Cancelled: ") + self.url)
+
+    def remove_partial_files(self):
+        """删除本任务下载到一半的临时文件和未合并的分段文件"""
+        for path in list(self._partial_files):
+            candidates = [path, path + '.ytdl'] + glob.glob(glob.escape(path) + '-Frag*')
+            if not path.endswith('.part'):
+                candidates.append(path + '.part')
+            for candidate in candidates:
+                try:
+                    os.unlink(candidate)
+                except OSError:
+                    pass
+        self._partial_files.clear()
+
+    def _handle_failure(self, error):
+        """按错误类别决定重试或失败"""
+        error_message = str(error)
+        self.attempt += 1
+        self.error_class = classify_error(error)
+        if self.error_class == ERROR_RATE_LIMITED:
+            self._report_throttle(error_message)
+
+        # 下载链接可能已过期，丢弃缓存的信息，重试时重新提取
+        if self.info is not None and STALE_INFO_PATTERN.search(error_message):
+            info_cache.invalidate(self._info_cache_key())
+            self.info = None
+
+        self.retry_delay = retry_policy.next_delay(self.error_class, self.attempt)
+        if self.retry_delay is not None:
+            # 还有重试机会，交由调度器延迟后重新入队
+            self.outcome = OUTCOME_RETRY
+            self.log_signal.emit(self._tr(
+                f"下载失败（{self.error_class}），{self.retry_delay:.0f}秒后重试: {error_message[:100]}",
+                f"Download failed ({self.error_class}), retrying in {self.retry_delay:.0f}s: {error_message[:100]}"))
+            self.status_signal.emit(self._tr("等待重试...", "Waiting to retry..."))
+        else:
+            # 永久错误或重试次数用完
+            self.outcome = OUTCOME_FAILED
+            retries = self.attempt - 1
+            self.error_signal.emit(error_message)
+            self.log_signal.emit(self._tr(f"下载失败（{self.error_class}），已重试{retries}次: {error_message}",
+                                          f"Download failed ({self.error_class}) after {retries} retries: {error_message}"))
+            self.status_signal.emit(self._tr("下载失败！", "Download failed!"))
 
     def yt_hook(self, d):
+        # 记录临时文件与已完成的分离流文件，取消时删除
+        for key in ('tmpfilename', 'filename'):
+            if d.get(key):
+                self._partial_files.add(d[key])
+        self._check_stop()
+
         if d['status'] == 'downloading':
+            if d.get('fragment_count'):
+                self._fragment_files.add(d.get('filename'))
+            self._set_stage('downloading')
             total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
             downloaded = d.get('downloaded_bytes', 0)
             percent = int(downloaded * 100 / total) if total else 0
+            if d.get('speed') is not None:
+                self._track_speed(d['speed'])
+            self._limit_bandwidth(d)
             self.progress_signal.emit(percent)
             self.status_signal.emit(
                 self._tr(f"下载中：{percent}%", f"Downloading: {percent}%")
             )
         elif d['status'] == 'finished':
+            if d.get('filename') in self._fragment_files:
+                self._tune_fragments(d)
+            self._set_stage('post-processing')
             self.status_signal.emit(self._tr("合并音视频中...", "Merging video and audio..."))
             self.log_signal.emit(self._tr("合并音视频中...", "Merging video and audio..."))
 
@@ -622,7 +871,9 @@ class DownloadWorker(QObject):
         def warning(self, msg):
             prefix = self.outer._tr("警告：", "Warning: ")
             self.outer.log_signal.emit(prefix + msg)
+            self.outer._report_throttle(msg)
 
         def error(self, msg):
             prefix = self.outer._tr("错误：", "Error: ")
             self.outer.log_signal.emit(prefix + msg)
+            self.outer._report_throttle(msg)
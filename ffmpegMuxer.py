@@ -0,0 +1,355 @@
+import os
+import re
+import subprocess
+import threading
+import time
+
+from yt_dlp.postprocessor import FFmpegMetadataPP
+from yt_dlp.utils import determine_protocol, prepend_extension
+
+MUX_POLL_INTERVAL = 0.2  # 等待ffmpeg时检查停止请求的间隔（秒）
+OUTPUT_EXT = 'mp4'
+SUBTITLE_CODEC = 'mov_text'  # mp4容器内的字幕编码
+STREAMABLE_PROTOCOLS = ('http', 'https')  # ffmpeg可以直接读取的协议（流式合并）
+
+
+def output_path(ydl, info):
+    """最终输出文件路径（按会话的输出模板，扩展名为mp4）"""
+    final_info = dict(info)
+    final_info['ext'] = OUTPUT_EXT
+    return ydl.prepare_filename(final_info)
+
+
+def _subtitle_files(info):
+    """已下载到本地的字幕文件 [(语言, 路径)]"""
+    files = []
+    for lang, sub in (info.get('requested_subtitles') or {}).items():
+        path = sub.get('filepath')
+        if path and os.path.exists(path):
+            files.append((lang, path))
+    return files
+
+
+def chapter_metadata(info):
+    """
+    由视频信息中的章节生成ffmpeg的FFMETADATA文本（与FFmpegMetadata后处理器写入的格式相同）
+
+    缺少结束时间的章节以下一章的开始时间或视频时长补齐。
+
+    Returns:
+        str: 元数据文本，没有有效章节时为None
+    """
+    chapters = [c for c in info.get('chapters') or () if c.get('start_time') is not None]
+    lines = [';FFMETADATA1']
+    for index, chapter in enumerate(chapters):
+        end = chapter.get('end_time')
+        if end is None:
+            end = chapters[index + 1]['start_time'] if index + 1 < len(chapters) else info.get('duration')
+        if end is None or end <= chapter['start_time']:
+            continue
+        lines += ['[CHAPTER]', 'TIMEBASE=1/1000',
+                  'START=%d' % (chapter['start_time'] * 1000), 'END=%d' % (end * 1000)]
+        if chapter.get('title'):
+            lines.append('title=' + re.sub(r'([\\=;#\n])', r'\\\1', chapter['title']))
+    if len(lines) == 1:
+        return None
+    return '\n'.join(lines) + '\n'
+
+
+def _metadata_options(metadata_pp, info):
+    """与yt-dlp一致的 -metadata 参数；yt-dlp内部接口不可用时只写入基本字段"""
+    get_options = getattr(metadata_pp, '_get_metadata_opts', None)
+    if get_options is not None:
+        return [arg for option in get_options(info) for arg in option]
+    options = []
+    for key, field in (('title', 'title'), ('artist', 'uploader'), ('date', 'upload_date'),
+                       ('comment', 'description'), ('purl', 'webpage_url')):
+        if info.get(field):
+            options += ['-metadata', f'{key}={info[field]}']
+    return options
+
+
+def mux_command(ffmpeg, inputs, output, plan, info, metadata_pp, subtitles=(),
+                input_options=None, faststart=True, chapters_file=None):
+    """
+    构建一次完成合并、字幕嵌入、章节与元数据写入和容器转换的ffmpeg命令
+
+    视频流总是复制；音频编码兼容mp4时复制，否则只重新编码音频。
+
+    Args:
+        ffmpeg (str): ffmpeg可执行文件路径
+        inputs (list): 输入（本地文件或流地址），视频在前
+        output (str): 输出文件路径
+        plan (FormatPlan): 格式方案
+        info (dict): 视频信息（用于生成元数据）
+        metadata_pp (FFmpegMetadataPP): 用于生成与yt-dlp一致的元数据参数
+        subtitles (list): [(语言, 字幕文件)]
+        input_options (list): 每个输入前附加的参数（如HTTP请求头），与inputs一一对应
+        faststart (bool): 是否把moov移到文件头（需要再重写一遍输出文件）
+        chapters_file (str): chapter_metadata生成的章节元数据文件（可选）
+
+    Returns:
+        list: 命令参数
+    """
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-nostdin', '-nostats', '-progress', 'pipe:1']
+    for index, source in enumerate(inputs):
+        if input_options:
+            cmd += input_options[index]
+        cmd += ['-i', source]
+    for _, path in subtitles:
+        cmd += ['-i', path]
+    if chapters_file:
+        cmd += ['-i', chapters_file]
+
+    if len(inputs) > 1:
+        cmd += ['-map', '0:v:0', '-map', '1:a:0']
+    else:
+        cmd += ['-map', '0:v?', '-map', '0:a?']
+    for index in range(len(subtitles)):
+        cmd += ['-map', f'{len(inputs) + index}:0']
+
+    cmd += ['-c:v', 'copy']
+    cmd += ['-c:a', 'aac', '-b:a', '192k'] if plan.reencode_audio else ['-c:a', 'copy']
+    if subtitles:
+        cmd += ['-c:s', SUBTITLE_CODEC]
+        for index, (lang, _) in enumerate(subtitles):
+            cmd += [f'-metadata:s:s:{index}', f'language={lang}']
+
+    if chapters_file:
+        chapters_input = str(len(inputs) + len(subtitles))
+        cmd += ['-map_metadata', chapters_input, '-map_chapters', chapters_input]
+
+    meta_info = dict(info)
+    meta_info['requested_formats'] = [plan.video] + ([plan.audio] if plan.audio else [])
+    cmd += _metadata_options(metadata_pp, meta_info)
+
+    if faststart:
+        cmd += ['-movflags', '+faststart']
+    cmd += ['-f', OUTPUT_EXT, output]
+    return cmd
+
+
+def _read_progress(stream, progress):
+    """读取 -progress 输出的 key=value 行，保存最新的值"""
+    for line in iter(stream.readline, b''):
+        key, _, value = line.decode('utf-8', 'replace').strip().partition('=')
+        if key:
+            progress[key] = value
+
+
+def run_ffmpeg(cmd, check_stop=None, on_progress=None):
+    """
+    执行ffmpeg，等待期间定期调用check_stop（抛出异常时终止ffmpeg）
+
+    Args:
+        cmd (list): ffmpeg命令（包含 -progress pipe:1）
+        check_stop (callable): 停止检查函数
+        on_progress (callable): ffmpeg进度更新时以最新的进度字典调用
+
+    Raises:
+        RuntimeError: ffmpeg返回非零退出码
+    """
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    progress = {}
+    reader = threading.Thread(target=_read_progress, args=(process.stdout, progress), daemon=True)
+    reader.start()
+    reported = None
+    try:
+        while process.poll() is None:
+            if check_stop is not None:
+                check_stop()
+            # ffmpeg约每0.5秒输出一次进度，只在有变化时回调
+            if on_progress is not None and progress and progress != reported:
+                reported = dict(progress)
+                on_progress(reported)
+            time.sleep(MUX_POLL_INTERVAL)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    reader.join()
+    process.stdout.close()
+    stderr = process.stderr.read().decode('utf-8', 'replace').strip()
+    process.stderr.close()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {stderr[-500:]}")
+
+
+class MuxTask:
+    """
+    准备好的一次ffmpeg后处理：命令在下载阶段构建，执行时不再需要YoutubeDL会话，
+    可以交给独立的后处理线程池运行
+
+    Attributes:
+        cmd (list): ffmpeg命令（输出到临时文件）
+        output (str): 最终文件路径
+        parts (list): 合并成功后删除的本地分离流文件
+        chapters (tuple): (章节元数据文件, 内容)，执行时写入、结束后删除；没有章节时为None
+    """
+
+    def __init__(self, cmd, temp_output, output, parts=(), chapters=None):
+        self.cmd = cmd
+        self.temp_output = temp_output
+        self.output = output
+        self.parts = list(parts)
+        self.chapters = chapters
+
+    def run(self, check_stop=None, on_progress=None):
+        """执行ffmpeg，成功后原子替换为最终文件并删除分离流文件"""
+        try:
+            if self.chapters:
+                with open(self.chapters[0], 'w', encoding='utf-8') as f:
+                    f.write(self.chapters[1])
+            run_ffmpeg(self.cmd, check_stop, on_progress)
+            os.replace(self.temp_output, self.output)
+        finally:
+            for path in (self.temp_output, self.chapters and self.chapters[0]):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+        for part in self.parts:
+            try:
+                os.unlink(part)
+            except OSError:
+                pass
+
+
+def prepare_mux(ydl, inputs, output, plan, info, parts=(), input_options=None, faststart=True):
+    """
+    构建单次ffmpeg后处理任务
+
+    Args:
+        ydl (YoutubeDL): 当前会话（提供ffmpeg路径和元数据规则）
+        inputs (list): 输入（本地文件或流地址）
+        output (str): 最终文件路径
+        plan (FormatPlan): 格式方案
+        info (dict): 视频信息
+        parts (list): 完成后需要删除的本地文件
+        input_options (list): 每个输入前附加的参数
+        faststart (bool): 是否把moov移到文件头
+
+    Returns:
+        MuxTask: 后处理任务
+    """
+    metadata_pp = FFmpegMetadataPP(ydl)
+    temp_output = prepend_extension(output, 'temp')
+    chapters = chapter_metadata(info)
+    chapters_file = os.path.splitext(output)[0] + '.chapters.meta' if chapters else None
+    cmd = mux_command(metadata_pp.executable, inputs, temp_output, plan, info, metadata_pp,
+                      _subtitle_files(info), input_options, faststart, chapters_file)
+    return MuxTask(cmd, temp_output, output, parts, (chapters_file, chapters) if chapters else None)
+
+
+def ffmpeg_available(ydl):
+    return FFmpegMetadataPP(ydl).available
+
+
+def _plan_streams(plan):
+    return [plan.video] + ([plan.audio] if plan.audio else [])
+
+
+def _final_result(info, output):
+    result = dict(info)
+    result['ext'] = OUTPUT_EXT
+    result['filepath'] = output
+    result['requested_downloads'] = [{'filepath': output}]
+    return result
+
+
+def download_streams(ydl, info, plan):
+    """
+    按格式方案下载各个流，返回尚未执行的后处理任务
+
+    合并、字幕嵌入、章节与元数据写入和容器转换由返回的MuxTask一次完成，
+    取代 合并 → FFmpegVideoConvertor → FFmpegEmbedSubtitle → FFmpegMetadata
+    依次重写整个文件的后处理链。各个流仍通过 ydl.dl 下载，
+    支持断点续传、分段并行下载和进度回调。
+
+    Args:
+        ydl (YoutubeDL): 当前会话
+        info (dict): 视频信息
+        plan (FormatPlan): 格式方案
+
+    Returns:
+        tuple: (下载完成后的视频信息（含filepath）, MuxTask；最终文件已存在时为None)
+    """
+    output = output_path(ydl, info)
+    result = _final_result(info, output)
+    if os.path.exists(output):
+        ydl.report_file_already_downloaded(output)
+        return result, None
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    base = os.path.splitext(output)[0]
+    parts = []
+    for fmt in _plan_streams(plan):
+        part_info = dict(info)
+        part_info.pop('requested_formats', None)
+        part_info.update(fmt)
+        part = f"{base}.f{fmt['format_id']}.{fmt.get('ext') or 'mp4'}"
+        success, _ = ydl.dl(part, part_info)
+        if not success:
+            raise RuntimeError(f"Failed to download format {fmt['format_id']}")
+        parts.append(part)
+
+    return result, prepare_mux(ydl, parts, output, plan, info, parts)
+
+
+def can_stream(plan):
+    """
+    方案中的所有流都是ffmpeg可以直接读取的HTTP(S)直链时才能流式合并
+
+    带有分块下载参数（downloader_options / http_chunk_size）的流（如YouTube）
+    不整段读取会被限速，ffmpeg的普通读取无法分块，这类流回退到先下载后合并。
+    """
+    return all(determine_protocol(fmt) in STREAMABLE_PROTOCOLS
+               and not fmt.get('downloader_options') and not fmt.get('http_chunk_size')
+               for fmt in _plan_streams(plan))
+
+
+def _stream_input_options(ydl, info, fmt):
+    """ffmpeg读取流地址时需要的Cookie与HTTP请求头"""
+    options = []
+    cookies = ydl.cookiejar.get_cookies_for_url(fmt['url'])
+    if cookies:
+        options += ['-cookies', ''.join(
+            f'{cookie.name}={cookie.value}; path={cookie.path}; domain={cookie.domain};\r\n'
+            for cookie in cookies)]
+    headers = fmt.get('http_headers') or info.get('http_headers')
+    if headers:
+        # 每个请求头必须以\r\n结尾，否则ffmpeg会给出警告
+        options += ['-headers', ''.join(f'{key}: {value}\r\n' for key, value in headers.items())]
+    return options
+
+
+def stream_and_mux(ydl, info, plan, check_stop=None, on_progress=None):
+    """
+    流式合并：ffmpeg直接读取各个流地址，边下载边写入最终的mp4
+
+    分离的流不落盘，输出文件只写一遍（不做faststart重写），最后一个
+    字节到达时文件即已完成。代价是无法断点续传（暂停后从头开始），
+    也不经过yt-dlp的进度回调与带宽限制器。
+
+    Args:
+        ydl (YoutubeDL): 当前会话（提供Cookie）
+        info (dict): 视频信息
+        plan (FormatPlan): 格式方案，所有流须满足can_stream
+        check_stop (callable): 停止检查函数
+        on_progress (callable): 以ffmpeg的进度字典定期调用
+
+    Returns:
+        dict: 完成后的视频信息（含filepath）
+    """
+    output = output_path(ydl, info)
+    result = _final_result(info, output)
+    if os.path.exists(output):
+        ydl.report_file_already_downloaded(output)
+        return result
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    formats = _plan_streams(plan)
+    task = prepare_mux(ydl, [fmt['url'] for fmt in formats], output, plan, info,
+                       input_options=[_stream_input_options(ydl, info, fmt) for fmt in formats],
+                       faststart=False)
+    task.run(check_stop, on_progress)
+    return result
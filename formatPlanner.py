@@ -0,0 +1,166 @@
+# 可以直接复制进mp4容器的编码，排在前面的优先（兼容性更好）
+MP4_VIDEO_CODECS = ('avc1', 'h264', 'hvc1', 'hev1', 'hevc', 'h265', 'av01', 'vp09', 'vp9')
+MP4_AUDIO_CODECS = ('mp4a', 'aac', 'mp3', 'ac-3', 'ac3', 'ec-3', 'eac3')
+
+# 输出为mp4时音频重新编码的参数（音频编码不兼容时使用）
+AUDIO_REENCODE_ARGS = ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
+STREAM_COPY_ARGS = ['-c:v', 'copy', '-c:a', 'copy']
+
+
+def _codec_rank(codec, compatible):
+    """编码在兼容列表中的位置，越小越好；不兼容时返回列表长度"""
+    codec = (codec or '').lower()
+    for rank, prefix in enumerate(compatible):
+        if codec.startswith(prefix):
+            return rank
+    return len(compatible)
+
+
+def _has_video(fmt):
+    return fmt.get('vcodec') not in (None, 'none') or (fmt.get('height') and fmt.get('vcodec') is None)
+
+
+def _has_audio(fmt):
+    return fmt.get('acodec') not in (None, 'none')
+
+
+def _mp4_ready(fmt):
+    """单文件格式无需ffmpeg即可作为mp4保存：mp4容器且音视频编码都兼容"""
+    return fmt.get('ext') == 'mp4' \
+        and _codec_rank(fmt.get('vcodec'), MP4_VIDEO_CODECS) < len(MP4_VIDEO_CODECS) \
+        and _codec_rank(fmt.get('acodec'), MP4_AUDIO_CODECS) < len(MP4_AUDIO_CODECS)
+
+
+def format_bytes(fmt, duration=None):
+    """格式的字节数：精确大小、近似大小，或按码率与时长估算"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = fmt['tbr'] * 1000 / 8 * duration
+    return int(size or 0)
+
+
+class FormatPlan:
+    """
+    一次下载的格式方案
+
+    Attributes:
+        format_spec (str): 传给yt-dlp的格式ID，如 "137+140"
+        video (dict): 所选视频流（单文件格式时为该格式）
+        audio (dict): 所选音频流，单文件格式时为None
+        planned_bytes (int): 预计下载字节数（未知时为0）
+        reencode_video (bool): 视频编码无法直接放入mp4，需要转码
+        reencode_audio (bool): 音频编码无法直接放入mp4，需要转码
+    """
+
+    def __init__(self, video, audio, duration=None):
+        self.video = video
+        self.audio = audio
+        self.format_spec = video['format_id'] + (f"+{audio['format_id']}" if audio else '')
+        self.planned_bytes = format_bytes(video, duration) + (format_bytes(audio, duration) if audio else 0)
+        self.reencode_video = _codec_rank(video.get('vcodec'), MP4_VIDEO_CODECS) == len(MP4_VIDEO_CODECS)
+        audio_source = audio or video
+        self.reencode_audio = _has_audio(audio_source) and \
+            _codec_rank(audio_source.get('acodec'), MP4_AUDIO_CODECS) == len(MP4_AUDIO_CODECS)
+
+    @property
+    def needs_reencode(self):
+        return self.reencode_video or self.reencode_audio
+
+    @property
+    def height(self):
+        return self.video.get('height')
+
+    @property
+    def postprocessor_args(self):
+        """音频已兼容时直接复制流，否则只重新编码音频"""
+        return AUDIO_REENCODE_ARGS if self.reencode_audio else STREAM_COPY_ARGS
+
+    def describe(self):
+        codecs = self.video.get('vcodec') or '?'
+        if self.audio:
+            codecs += f" + {self.audio.get('acodec') or '?'}"
+        size = f"{self.planned_bytes / 1024 / 1024:.1f} MB" if self.planned_bytes else '? MB'
+        return f"{self.format_spec} ({self.height or '?'}p, {codecs}, {size})"
+
+
+def _best_by_height(candidates, max_height, sort_key):
+    """在不超过目标高度的候选中取最高分辨率，同一分辨率内按sort_key择优"""
+    if not candidates:
+        return None
+    eligible = [f for f in candidates if not max_height or (f.get('height') or 0) <= max_height]
+    # 所有格式都高于目标时退而取最低的一档
+    if not eligible:
+        lowest = min(f.get('height') or 0 for f in candidates)
+        eligible = [f for f in candidates if (f.get('height') or 0) == lowest]
+    top = max(f.get('height') or 0 for f in eligible)
+    return min((f for f in eligible if (f.get('height') or 0) == top), key=sort_key)
+
+
+def plan_formats(info, quality='best', can_merge=True):
+    """
+    根据可用格式规划下载方案
+
+    在不超过目标高度的最高分辨率中优先选择可直接放入mp4的编码
+    （H.264/HEVC/AV1/VP9 + AAC），使合并时只需复制流、无需转码；
+    同一分辨率没有兼容编码时才选择需要转码的格式。高度上限优先于
+    是否合并：所有格式都超出上限时取最接近上限的一档。不能合并
+    （没有ffmpeg，也就无法转码）时只考虑可直接保存为mp4的单文件
+    格式，没有时返回None，沿用清晰度对应的格式字符串。
+
+    Args:
+        info (dict): yt-dlp提取到的视频信息
+        quality (str): 清晰度，'best' 或目标高度（如 '1080'）
+        can_merge (bool): 是否可以合并分离的音视频流
+
+    Returns:
+        FormatPlan: 格式方案；没有可规划的格式时为None
+    """
+    formats = [f for f in info.get('formats') or [] if f.get('format_id') and f.get('url')]
+    if not formats:
+        return None
+    max_height = int(quality) if str(quality).isdigit() else None
+    duration = info.get('duration')
+
+    def video_key(fmt):
+        return (_codec_rank(fmt.get('vcodec'), MP4_VIDEO_CODECS), -(fmt.get('tbr') or 0))
+
+    def audio_key(fmt):
+        return (_codec_rank(fmt.get('acodec'), MP4_AUDIO_CODECS), -(fmt.get('abr') or fmt.get('tbr') or 0))
+
+    def combined_key(fmt):
+        return (video_key(fmt)[0] + _codec_rank(fmt.get('acodec'), MP4_AUDIO_CODECS), -(fmt.get('tbr') or 0))
+
+    def over_cap(fmt):
+        return bool(max_height) and (fmt.get('height') or 0) > max_height
+
+    combined = [f for f in formats if _has_video(f) and _has_audio(f)]
+    if not can_merge:
+        best_combined = _best_by_height([f for f in combined if _mp4_ready(f)], max_height, combined_key)
+        return FormatPlan(best_combined, None, duration) if best_combined else None
+    best_combined = _best_by_height(combined, max_height, combined_key)
+
+    video_only = [f for f in formats if _has_video(f) and not _has_audio(f)]
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    best_video = _best_by_height(video_only, max_height, video_key)
+    best_audio = min(audio_only, key=audio_key) if audio_only else None
+
+    if best_video is None or best_audio is None:
+        return FormatPlan(best_combined, None, duration) if best_combined else None
+
+    plan = FormatPlan(best_video, best_audio, duration)
+    if best_combined is None:
+        return plan
+    combined_height = best_combined.get('height') or 0
+    if over_cap(plan.video):
+        # 分离的视频流都高于目标高度，单文件格式更接近目标时使用单文件格式
+        if combined_height < (plan.height or 0):
+            return FormatPlan(best_combined, None, duration)
+    elif over_cap(best_combined):
+        # 单文件格式超出目标高度，不能替代目标高度以内的分离流
+        return plan
+    # 单文件格式分辨率不低于分离流且无需转码时，省去合并
+    if combined_height >= (plan.height or 0):
+        single = FormatPlan(best_combined, None, duration)
+        if not single.needs_reencode or plan.needs_reencode:
+            return single
+    return plan
@@ -0,0 +1,88 @@
+import threading
+
+FRAGMENT_INITIAL = 2  # 每个任务初始的并行分段数（保守起步）
+FRAGMENT_MIN = 1
+FRAGMENT_MAX_PER_TASK = 8  # 单个任务最多并行下载的分段数
+GLOBAL_FRAGMENT_BUDGET = 16  # 所有任务并行分段数之和的上限
+FRAGMENT_GROWTH_THRESHOLD = 1.1  # 吞吐量提升超过10%才继续增加分段数
+FRAGMENT_DECREASE_THRESHOLD = 0.9  # 吞吐量下降超过10%时减少分段数
+HTTP_CHUNK_SIZE = 10 * 1024 * 1024  # 非分段格式按10MB分块请求，避免单连接被限速
+
+
+class FragmentTuner:
+    """
+    HLS/DASH分段格式的并行分段数调节器
+
+    按站点记录当前的分段并行数：每下载完一个分段格式，根据实测
+    吞吐量爬坡调整（提升明显则加一，下降则减一，限流时减半）。
+    所有任务已分配的分段数之和受全局预算约束，批量并发数与分段
+    并发数相乘也不会失控。
+
+    预算用完时仍为每个任务分配1个分段（有意为之的下限）：任务已占用
+    调度器的下载槽位，等待分段预算只会让槽位空转。因此分段总数最多
+    超出预算"同时运行的任务数"个，而任务数本身受调度器并发数限制。
+    """
+
+    def __init__(self, budget=GLOBAL_FRAGMENT_BUDGET, per_task=FRAGMENT_MAX_PER_TASK,
+                 initial=FRAGMENT_INITIAL):
+        self._lock = threading.Lock()
+        self.budget = budget
+        self.per_task = per_task
+        self.initial = initial
+        self._levels = {}  # 站点 -> 当前分段并行数
+        self._last_rate = {}  # 站点 -> 上一次实测吞吐量（字节/秒）
+        self._in_use = 0  # 已分配的分段数之和
+
+    def level(self, host):
+        return self._levels.get(host, self.initial)
+
+    def acquire(self, host):
+        """
+        为任务分配并行分段数
+
+        Args:
+            host (str): 任务所属站点
+
+        Returns:
+            int: 分配的分段数（预算用完时为1，见类说明），用完后需调用release归还
+        """
+        with self._lock:
+            available = self.budget - self._in_use
+            grant = max(FRAGMENT_MIN, min(self.level(host), available))
+            self._in_use += grant
+            return grant
+
+    def release(self, grant):
+        with self._lock:
+            self._in_use = max(0, self._in_use - grant)
+
+    def record(self, host, grant, rate):
+        """
+        记录一次分段格式下载的吞吐量并调整该站点的分段数
+
+        Args:
+            host (str): 任务所属站点
+            grant (int): 本次下载使用的分段数
+            rate (float): 实测吞吐量（字节/秒）
+        """
+        with self._lock:
+            level = self.level(host)
+            previous = self._last_rate.get(host)
+            self._last_rate[host] = rate
+            if previous is None or rate > previous * FRAGMENT_GROWTH_THRESHOLD:
+                # 首次测量或提升明显：继续尝试更多分段（只在分配数已达当前档位时增加）
+                if grant >= level:
+                    level = grant + 1
+            elif rate < previous * FRAGMENT_DECREASE_THRESHOLD:
+                level = grant - 1
+            self._levels[host] = max(FRAGMENT_MIN, min(level, self.per_task))
+
+    def on_throttled(self, host):
+        """站点限流时分段数减半，并重新建立吞吐量基线"""
+        with self._lock:
+            self._levels[host] = max(FRAGMENT_MIN, self.level(host) // 2)
+            self._last_rate.pop(host, None)
+
+
+# 进程内共享的分段数调节器
+fragment_tuner = FragmentTuner()
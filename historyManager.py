@@ -1,17 +1,17 @@
-import json
 import os
 import webbrowser
 
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QColor, QBrush
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QLineEdit,
-    QTableWidget, QTableWidgetItem, QHBoxLayout, QPushButton,
+    QTableView, QHeaderView, QHBoxLayout, QPushButton,
     QMessageBox, QMenu, QFileDialog, QApplication, QAbstractItemView
 )
 
-HISTORY_FILE = "download_history.json"  # 历史记录保存文件
-MAX_VISIBLE = 15  # 可视化的最多条数
+from historyModel import HistoryTableModel
+from historyStore import HistoryStore
+
+HISTORY_ROW_HEIGHT = 30  # 表格行高（固定行高，不再逐行计算）
 QSS_FILE = "history.qss"  # CSS样式文件
 
 
@@ -29,7 +29,7 @@ QSS_FILE = "history.qss"  # CSS样式文件
 # 设计特点：
 # - 数据与 UI 解耦
 # - 表格按比例自适应
-# - 所有修改均持久化到 JSON
+# - 所有修改由后台线程批量写入 SQLite，不阻塞界面
 # ============================
 class HistoryManager(QWidget):
 
@@ -83,16 +83,21 @@ class HistoryManager(QWidget):
         self.empty_label.hide()
 
         # ===== 历史表格 =====
-        self.table = QTableWidget()
+        self.store = HistoryStore()
+        self.model = HistoryTableModel(self.store, parent=self)
+        self.table = QTableView()
         self.table.setObjectName("historyTable")
-        self.table.setColumnCount(2)
-        self.table.setHorizontalHeaderLabels(['URL', "Status"])
+        self.table.setModel(self.model)
+        # 视图滚动到底部自动加载下一页后同步"加载更多"按钮
+        self.model.rowsInserted.connect(lambda *_: self.update_view_state())
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setWordWrap(False)
         self.table.setShowGrid(False)
         self.table.setAlternatingRowColors(True)
         self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(HISTORY_ROW_HEIGHT)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.table_right_click)
 
@@ -114,8 +119,6 @@ class HistoryManager(QWidget):
         self.setMinimumHeight(600)
 
         # ===== 数据 =====
-        self.history = []
-        self.display_count = MAX_VISIBLE
         self.load_history()
 
     # ----------------------------
@@ -145,83 +148,38 @@ class HistoryManager(QWidget):
         self.set_table_col_stretch()
 
     # ----------------------------
-    # 从本地 JSON 文件加载历史记录
+    # 加载历史记录（从第一页开始显示）
     # ----------------------------
     def load_history(self):
-        self.history = []
-        if os.path.exists(HISTORY_FILE):
-            try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    self.history = json.load(f)
-            except Exception:
-                self.history = []
-        self.display_count = MAX_VISIBLE
         self.refresh_history_list()
 
     # ----------------------------
-    # 将当前历史记录保存到本地
+    # 写入剩余的历史记录并关闭数据库（程序退出时调用）
     # ----------------------------
-    def save_history(self):
-        try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+    def shutdown(self):
+        self.store.close()
 
     # ----------------------------
-    # 根据搜索条件刷新表格内容
+    # 根据搜索条件重新加载表格（只读取第一页）
     # ----------------------------
     def refresh_history_list(self):
-        self.table.setRowCount(0)
-        query = self.search_bar.text().strip().lower()
-        show_items = self.history[-self.display_count:][::-1]
-        if query:
-            show_items = [
-                item for item in show_items
-                if query in item.get("url", "").lower()
-                or query in item.get("status", "").lower()
-            ]
-        if not show_items:
-            self.empty_label.show()
-            self.load_more_btn.hide()
-            return
-
-        self.empty_label.hide()
-        for item in show_items:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-
-            url_item = QTableWidgetItem(item.get("url", ""))
-            url_item.setToolTip(item.get("url", ""))
-            url_item.setFont(QFont("Arial", 10))
-            url_item.setForeground(QBrush(QColor("#ffffff")))
-            url_item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-
-            status_item = QTableWidgetItem(item.get("status", ""))
-            status_item.setFont(QFont("Arial", 11, QFont.Bold))
-            status_item.setTextAlignment(Qt.AlignCenter)
-
-            status_color = {
-                "完成！": "#4CAF50",
-                "Complete!": "#4CAF50",
-                "下载失败": "#FF5252",
-                "Download Failed": "#FF5252"
-            }.get(item.get("status", ""), "#00BCD4")
-            status_item.setForeground(QBrush(QColor(status_color)))
-
-            self.table.setItem(row, 0, url_item)
-            self.table.setItem(row, 1, status_item)
-
+        self.model.set_query(self.search_bar.text())
         self.set_table_col_stretch()
-        self.table.resizeRowsToContents()
-        self.load_more_btn.setVisible(self.display_count < len(self.history) and not query)
+        self.update_view_state()
 
     # ----------------------------
-    # 分页加载更多历史记录
+    # 根据已加载的行更新空状态提示与"加载更多"按钮
+    # ----------------------------
+    def update_view_state(self):
+        self.empty_label.setVisible(self.model.rowCount() == 0)
+        self.load_more_btn.setVisible(self.model.canFetchMore())
+
+    # ----------------------------
+    # 分页加载更多历史记录（滚动到底部时视图也会自动加载）
     # ----------------------------
     def show_more_history(self):
-        self.display_count += MAX_VISIBLE
-        self.refresh_history_list()
+        self.model.fetchMore()
+        self.update_view_state()
 
     # ----------------------------
     # 清空全部历史记录（带确认）
@@ -235,40 +193,23 @@ class HistoryManager(QWidget):
             QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            self.history = []
-            self.save_history()
+            self.store.clear()
             self.refresh_history_list()
 
     # ----------------------------
     # 删除指定视图索引对应的历史记录
     # ----------------------------
     def delete_callback(self, view_idx):
-        query = self.search_bar.text().strip().lower()
-        show_items = self.history[-self.display_count:][::-1]
-        if query:
-            show_items = [
-                item for item in show_items
-                if query in item.get("url", "").lower()
-                or query in item.get("status", "").lower()
-            ]
-        if 0 <= view_idx < len(show_items):
-            to_del = show_items[view_idx]
-            for i, h in enumerate(self.history):
-                if h.get("url") == to_del.get("url") and h.get("status") == to_del.get("status"):
-                    self.history.pop(i)
-                    break
-            self.save_history()
-            self.display_count = min(self.display_count, len(self.history))
-            self.refresh_history_list()
+        self.model.remove_row(view_idx)
+        self.update_view_state()
 
     # ----------------------------
     # 向历史记录中追加一条新记录
     # ----------------------------
     def add_to_history(self, url, status):
-        self.history.append({"url": url, "status": status})
-        self.save_history()
-        self.display_count = min(self.display_count + 1, len(self.history))
-        self.refresh_history_list()
+        row_id = self.store.add(url, status)
+        self.model.prepend(row_id, url, status)
+        self.update_view_state()
 
     # ----------------------------
     # 切换界面语言
@@ -296,8 +237,8 @@ class HistoryManager(QWidget):
             return
         try:
             with open(path, "w", encoding="utf-8") as f:
-                for item in self.history:
-                    f.write(f"URL: {item.get('url', '')}\nStatus: {item.get('status', '')}\n\n")
+                for _, url, status in self.store.entries():
+                    f.write(f"URL: {url}\nStatus: {status}\n\n")
             QMessageBox.information(self, "导出成功", f"历史已导出到: {path}")
         except Exception as e:
             QMessageBox.warning(self, "导出失败", f"导出历史失败: {str(e)}")
@@ -322,7 +263,7 @@ class HistoryManager(QWidget):
         if not idx.isValid():
             return
         row = idx.row()
-        url = self.table.item(row, 0).text()
+        url = self.model.url(row)
 
         menu = QMenu(self)
         menu.addAction(
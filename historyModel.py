@@ -0,0 +1,128 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QFont, QColor, QBrush
+
+HISTORY_PAGE_SIZE = 200  # 每次从数据库按需读取的行数
+
+# 状态文字的颜色，其余状态使用默认颜色
+STATUS_COLORS = {
+    "完成！": "#4CAF50",
+    "Complete!": "#4CAF50",
+    "下载失败": "#FF5252",
+    "Download Failed": "#FF5252"
+}
+DEFAULT_STATUS_COLOR = "#00BCD4"
+
+COLUMN_URL = 0
+COLUMN_STATUS = 1
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """
+    下载历史的表格模型
+
+    数据直接来自HistoryStore，只保存已读取的行；视图滚动到底部时通过
+    canFetchMore/fetchMore 再读取一页，十万条记录也只读取可见部分。
+    字体与画刷在模型中创建一次后共享，不再为每个单元格新建。每行记录其
+    在存储中的ID，删除时按行号直接取得ID，不需要按URL与状态查找。
+    """
+
+    def __init__(self, store, page_size=HISTORY_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.page_size = page_size
+        self.query = ''
+        self._rows = []  # 已读取的行：[(ID, URL, 状态)]，从新到旧
+        self._total = 0  # 符合搜索条件的总行数
+
+        self._url_font = QFont("Arial", 10)
+        self._status_font = QFont("Arial", 11, QFont.Bold)
+        self._url_brush = QBrush(QColor("#ffffff"))
+        self._status_brushes = {}  # 状态文字 -> QBrush
+
+    # ----------------------------
+    # QAbstractTableModel 接口
+    # ----------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ('URL', 'Status')[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row_id, url, status = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return url if column == COLUMN_URL else status
+        if role == Qt.UserRole:
+            return row_id
+        if role == Qt.ToolTipRole and column == COLUMN_URL:
+            return url
+        if role == Qt.FontRole:
+            return self._url_font if column == COLUMN_URL else self._status_font
+        if role == Qt.ForegroundRole:
+            return self._url_brush if column == COLUMN_URL else self._status_brush(status)
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignLeft | Qt.AlignVCenter) if column == COLUMN_URL else int(Qt.AlignCenter)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self._rows) < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        rows = self.store.page(len(self._rows), self.page_size, self.query)
+        if not rows:
+            # 数据库中的记录比预期少（如被外部删除），以已读取的为准
+            self._total = len(self._rows)
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    # ----------------------------
+    # 数据操作
+    # ----------------------------
+    def _status_brush(self, status):
+        brush = self._status_brushes.get(status)
+        if brush is None:
+            brush = self._status_brushes[status] = QBrush(QColor(STATUS_COLORS.get(status, DEFAULT_STATUS_COLOR)))
+        return brush
+
+    def set_query(self, query):
+        """按搜索条件重新加载，只读取第一页"""
+        self.beginResetModel()
+        self.query = query.strip().lower()
+        self._total = self.store.count(self.query)
+        self._rows = self.store.page(0, self.page_size, self.query)
+        self.endResetModel()
+
+    def prepend(self, row_id, url, status):
+        """新记录插入到最前面（不符合当前搜索条件时忽略）"""
+        if self.query and self.query not in url.lower() and self.query not in status.lower():
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._rows.insert(0, (row_id, url, status))
+        self._total += 1
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        """从存储和视图中删除一行"""
+        if not 0 <= row < len(self._rows):
+            return
+        self.store.delete(self._rows[row][0])
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self._total -= 1
+        self.endRemoveRows()
+
+    def url(self, row):
+        return self._rows[row][1]
@@ -0,0 +1,250 @@
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from appPaths import data_path
+
+HISTORY_DB = "download_history.db"  # 历史记录数据库文件（位于程序数据目录）
+LEGACY_HISTORY_FILE = "download_history.json"  # 旧版JSON历史记录，首次运行时导入
+HISTORY_BATCH_WINDOW = 0.5  # 合并写入的时间窗口（秒），窗口内的修改在一个事务中提交
+
+# 写入队列中的操作
+OP_ADD = 'add'
+OP_DELETE = 'delete'
+OP_CLEAR = 'clear'
+
+
+class HistoryStore:
+    """
+    基于SQLite（WAL模式）的下载历史记录
+
+    修改只放入队列，由后台写入线程按时间窗口合并成一个事务提交，
+    界面线程不做任何磁盘写入；每条记录的ID在加入时即分配，界面可以
+    立刻按ID删除尚未写入的记录。尚未提交的修改保存在内存中，读取时
+    与数据库中的记录合并，结果始终是最新的。
+
+    每批修改是一个事务，程序崩溃最多丢失最后一个时间窗口内的修改，
+    不会留下写了一半的历史记录。
+    """
+
+    def __init__(self, path=None, legacy_file=LEGACY_HISTORY_FILE, batch_window=HISTORY_BATCH_WINDOW):
+        self._lock = threading.Lock()
+        self.batch_window = batch_window
+        self._conn = sqlite3.connect(path or data_path(HISTORY_DB), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS history_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+        self._import_legacy(legacy_file)
+
+        with self._lock:
+            last_id = self._conn.execute('SELECT MAX(id) FROM history').fetchone()[0] or 0
+        self._ids = itertools.count(last_id + 1)
+        self._pending_rows = {}  # 尚未写入的新记录：ID -> (ID, URL, 状态)
+        self._pending_deletes = set()  # 尚未写入的删除
+        self._cleared_below = 0  # 尚未写入的清空：ID小于该值的已写入记录视为已删除
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def _import_legacy(self, legacy_file):
+        """
+        首次运行时导入旧版JSON历史记录
+
+        记录与"已导入"标记在同一事务中写入，导入中途崩溃时下次启动会重新导入，
+        不会重复或丢失。旧文件保持原样（它可能受版本控制），是否已导入只记录在数据库中。
+        """
+        with self._lock:
+            imported = self._conn.execute(
+                "SELECT 1 FROM history_meta WHERE key = 'legacy_imported'"
+            ).fetchone()
+        if imported or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"导入旧版历史记录失败: {e}")
+            return
+
+        now = time.time()
+        rows = [
+            (str(item.get('url', '')), str(item.get('status', '')), now)
+            for item in items if isinstance(item, dict)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT INTO history (url, status, created) VALUES (?, ?, ?)', rows)
+            self._conn.execute("INSERT INTO history_meta VALUES ('legacy_imported', ?)", (legacy_file,))
+
+    # ----------------------------
+    # 修改（只入队，由写入线程提交）
+    # ----------------------------
+    def add(self, url, status):
+        """
+        添加一条记录
+
+        Returns:
+            int: 记录ID
+        """
+        with self._lock:
+            row_id = next(self._ids)
+            self._pending_rows[row_id] = (row_id, url, status)
+        self._queue.put((OP_ADD, row_id, url, status, time.time()))
+        return row_id
+
+    def delete(self, row_id):
+        with self._lock:
+            self._pending_rows.pop(row_id, None)
+            self._pending_deletes.add(row_id)
+        self._queue.put((OP_DELETE, row_id))
+
+    def clear(self):
+        with self._lock:
+            below = next(self._ids)
+            self._pending_rows.clear()
+            self._pending_deletes.clear()
+            self._cleared_below = below
+        self._queue.put((OP_CLEAR, below))
+
+    # ----------------------------
+    # 读取（合并尚未写入的修改）
+    # ----------------------------
+    def _where(self, query):
+        clauses, params = ['id >= ?'], [self._cleared_below]
+        if self._pending_deletes:
+            clauses.append(f"id NOT IN ({', '.join('?' * len(self._pending_deletes))})")
+            params.extend(self._pending_deletes)
+        if query:
+            clauses.append('(instr(lower(url), ?) > 0 OR instr(lower(status), ?) > 0)')
+            params.extend((query, query))
+        return ' AND '.join(clauses), params
+
+    def _pending_matches(self, query):
+        """尚未写入的新记录，从新到旧，已按搜索过滤"""
+        rows = [self._pending_rows[row_id] for row_id in sorted(self._pending_rows, reverse=True)]
+        if query:
+            rows = [row for row in rows if query in row[1].lower() or query in row[2].lower()]
+        return rows
+
+    def count(self, query=''):
+        """符合搜索条件（URL或状态包含，不区分大小写）的记录数"""
+        query = query.strip().lower()
+        with self._lock:
+            where, params = self._where(query)
+            stored = self._conn.execute(f'SELECT COUNT(*) FROM history WHERE {where}', params).fetchone()[0]
+            return stored + len(self._pending_matches(query))
+
+    def page(self, offset, limit, query=''):
+        """
+        按从新到旧的顺序读取一页记录
+
+        Args:
+            offset (int): 跳过的记录数
+            limit (int): 最多返回的记录数
+            query (str): 搜索条件（URL或状态包含，不区分大小写）
+
+        Returns:
+            list: [(ID, URL, 状态)]
+        """
+        query = query.strip().lower()
+        with self._lock:
+            pending = self._pending_matches(query)
+            rows = pending[offset:offset + limit]
+            if len(rows) < limit:
+                where, params = self._where(query)
+                rows += self._conn.execute(
+                    f'SELECT id, url, status FROM history WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?',
+                    (*params, limit - len(rows), max(0, offset - len(pending)))
+                ).fetchall()
+        return rows
+
+    def entries(self):
+        """
+        全部记录（导出用），从旧到新
+
+        Returns:
+            list: [(ID, URL, 状态)]
+        """
+        self.flush()
+        with self._lock:
+            return self._conn.execute('SELECT id, url, status FROM history ORDER BY id').fetchall()
+
+    # ----------------------------
+    # 写入线程
+    # ----------------------------
+    def _write_loop(self):
+        while True:
+            ops = [self._queue.get()]
+            # 收集时间窗口内的后续修改；遇到flush请求或关闭时立即提交
+            deadline = time.monotonic() + self.batch_window
+            while isinstance(ops[-1], tuple):
+                try:
+                    ops.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._commit([op for op in ops if isinstance(op, tuple)])
+            for op in ops:
+                if isinstance(op, threading.Event):
+                    op.set()
+            if ops[-1] is None:
+                return
+
+    def _commit(self, ops):
+        if not ops:
+            return
+        with self._lock:
+            try:
+                with self._conn:
+                    for op in ops:
+                        if op[0] == OP_ADD:
+                            self._conn.execute('INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?)', op[1:])
+                        elif op[0] == OP_DELETE:
+                            self._conn.execute('DELETE FROM history WHERE id = ?', (op[1],))
+                        elif op[0] == OP_CLEAR:
+                            self._conn.execute('DELETE FROM history WHERE id < ?', (op[1],))
+            except sqlite3.Error as e:
+                # 事务已回滚，修改仍保留在内存中，本次运行期间照常显示
+                print(f"写入历史记录失败: {e}")
+                return
+
+            for op in ops:
+                if op[0] == OP_ADD:
+                    self._pending_rows.pop(op[1], None)
+                elif op[0] == OP_DELETE:
+                    self._pending_deletes.discard(op[1])
+                elif op[0] == OP_CLEAR and self._cleared_below == op[1]:
+                    self._cleared_below = 0
+
+    def flush(self, timeout=None):
+        """等待此前的所有修改写入数据库"""
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """写入剩余的修改并关闭数据库"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._lock:
+            self._conn.close()
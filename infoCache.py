@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from appPaths import data_path
+
+CACHE_DIR = os.path.join("cache", "info")  # 视频信息缓存目录（位于程序数据目录）
+MAX_CACHE_BYTES = 200 * 1024 * 1024  # 缓存总大小上限
+DEFAULT_TTL = 3600  # 默认有效期（秒）
+EXPIRE_MARGIN = 600  # 签名链接过期前预留的安全时间（秒）
+
+# 各提取器的有效期（秒），签名下载链接过期较快的站点设置得更短
+EXTRACTOR_TTLS = {
+    'youtube': 4 * 3600,
+    'bilibili': 1800,
+    'twitter': 3600,
+    'facebook': 1800,
+    'instagram': 1800,
+    'generic': 6 * 3600,
+}
+
+# 规范化URL时丢弃的跟踪参数
+_TRACKING_PARAMS = {'si', 'feature', 'spm_id_from', 'vd_source', 'share_source', 'from', 'ref'}
+
+
+def normalize_url(url):
+    """
+    规范化URL用作缓存键
+
+    统一协议与主机名大小写，去掉片段和常见跟踪参数，并对查询参数排序。
+    """
+    try:
+        parsed = urllib.parse.urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    query = [
+        (k, v) for k, v in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith('utm_')
+    ]
+    return urllib.parse.urlunsplit((
+        parsed.scheme.lower(),
+        parsed.netloc.lower(),
+        parsed.path.rstrip('/') or '/',
+        urllib.parse.urlencode(sorted(query)),
+        '',
+    ))
+
+
+def _signed_url_expiry(info):
+    """从所选格式链接的 expire 参数中读取签名过期时间（YouTube等站点）"""
+    expiries = []
+    for fmt in info.get('requested_formats') or [info]:
+        query = urllib.parse.urlsplit(fmt.get('url') or '').query
+        for value in urllib.parse.parse_qs(query).get('expire', []):
+            if value.isdigit():
+                expiries.append(int(value))
+    return min(expiries) if expiries else None
+
+
+class InfoCache:
+    """
+    磁盘上的视频信息缓存
+
+    以规范化URL、cookie身份和格式选择为键缓存 extract_info 的结果，
+    按提取器设置有效期（并参考签名链接的过期时间），超过容量上限时
+    按最近使用时间淘汰。重试和重复提交的任务可直接开始下载。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+        self._cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 首次写入时统计
+
+    @property
+    def cache_dir(self):
+        """缓存目录，未指定时在首次使用时取程序数据目录下的CACHE_DIR"""
+        if self._cache_dir is None:
+            self._cache_dir = data_path(CACHE_DIR)
+        return self._cache_dir
+
+    @staticmethod
+    def make_key(url, cookie_identity='', fmt=''):
+        raw = '\n'.join((normalize_url(url), cookie_identity or '', fmt or ''))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """
+        读取未过期的缓存
+
+        Returns:
+            dict: 视频信息，未命中或已过期时为None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('expires', 0) <= time.time():
+            self.invalidate(key)
+            return None
+
+        try:
+            # 更新修改时间，作为LRU淘汰依据
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get('info')
+
+    def put(self, key, info):
+        """写入缓存，写入失败时静默忽略"""
+        extractor = (info.get('extractor_key') or info.get('extractor') or 'generic').lower()
+        now = time.time()
+        expires = now + EXTRACTOR_TTLS.get(extractor, DEFAULT_TTL)
+        signed_expiry = _signed_url_expiry(info)
+        if signed_expiry:
+            expires = min(expires, signed_expiry - EXPIRE_MARGIN)
+        if expires <= now:
+            return
+
+        entry = {'created': now, 'expires': expires, 'extractor': extractor, 'info': info}
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError):
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def invalidate(self, key):
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _entries(self):
+        try:
+            return [e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')]
+        except OSError:
+            return []
+
+    def _scan_total(self):
+        total = 0
+        for entry in self._entries():
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小降到上限的80%"""
+        stats = []
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, entry.path))
+        stats.sort()
+
+        total = sum(size for _, size, _ in stats)
+        target = self.max_bytes * 0.8
+        for _, size, path in stats:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+
+# 进程内共享的视频信息缓存
+info_cache = InfoCache()
@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+import time
+
+from appPaths import data_path
+
+JOURNAL_FILE = "job_journal.db"  # 任务日志数据库文件（位于程序数据目录）
+JOURNAL_RETENTION = 7 * 24 * 3600  # 已结束任务在日志中保留的时间（秒）
+
+# 任务状态
+STATE_QUEUED = 'queued'
+STATE_EXTRACTING = 'extracting'
+STATE_DOWNLOADING = 'downloading'
+STATE_POSTPROCESSING = 'post-processing'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+STATE_SKIPPED = 'skipped'
+STATE_PAUSED = 'paused'
+STATE_CANCELLED = 'cancelled'
+
+# 程序退出或崩溃时仍处于这些状态的任务会在下次启动时恢复（暂停的任务恢复为暂停状态）
+UNFINISHED_STATES = (STATE_QUEUED, STATE_EXTRACTING, STATE_DOWNLOADING, STATE_POSTPROCESSING, STATE_PAUSED)
+
+
+class JobJournal:
+    """
+    持久化的下载任务日志
+
+    记录每个任务的参数（保存目录、清晰度、cookie文件）及其状态变化，
+    状态变化同时追加到事件表。程序关闭或崩溃后，启动时可取回所有
+    未完成的任务重新入队，yt-dlp会从已有的 .part 文件继续下载。
+    """
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or data_path(JOURNAL_FILE), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    journal_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    quality TEXT,
+                    cookie_file TEXT,
+                    state TEXT NOT NULL,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_events (
+                    journal_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)')
+
+    def add(self, job):
+        """
+        记录新入队的任务
+
+        Args:
+            job (DownloadJob): 下载任务
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)',
+                (job.journal_id, job.url, job.folder, job.quality, job.cookie_file,
+                 STATE_QUEUED, now, now)
+            )
+            self._conn.execute('INSERT INTO job_events VALUES (?, ?, ?)',
+                               (job.journal_id, STATE_QUEUED, now))
+
+    def set_state(self, journal_id, state, error=None):
+        """
+        记录任务状态变化
+
+        Args:
+            journal_id (str): 任务的日志ID
+            state (str): 新状态
+            error (str): 失败原因（可选）
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, error = ?, updated = ? WHERE journal_id = ?',
+                (state, error, now, journal_id)
+            )
+            self._conn.execute('INSERT INTO job_events VALUES (?, ?, ?)',
+                               (journal_id, state, now))
+
+    def unfinished(self):
+        """
+        取回所有未完成的任务
+
+        Returns:
+            list: [{'journal_id', 'url', 'folder', 'quality', 'cookie_file', 'state'}]，按入队顺序
+        """
+        placeholders = ', '.join('?' * len(UNFINISHED_STATES))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT journal_id, url, folder, quality, cookie_file, state FROM jobs '
+                f'WHERE state IN ({placeholders}) ORDER BY created',
+                UNFINISHED_STATES
+            ).fetchall()
+        keys = ('journal_id', 'url', 'folder', 'quality', 'cookie_file', 'state')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def prune(self, retention=JOURNAL_RETENTION):
+        """删除超过保留时间的已结束任务及其事件"""
+        cutoff = time.time() - retention
+        placeholders = ', '.join('?' * len(UNFINISHED_STATES))
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'DELETE FROM job_events WHERE journal_id IN ('
+                f'SELECT journal_id FROM jobs WHERE updated < ? AND state NOT IN ({placeholders}))',
+                (cutoff, *UNFINISHED_STATES)
+            )
+            self._conn.execute(
+                f'DELETE FROM jobs WHERE updated < ? AND state NOT IN ({placeholders})',
+                (cutoff, *UNFINISHED_STATES)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,21 +5,34 @@ import sys
 from datetime import datetime
 
 import qdarkstyle
-from PyQt5.QtCore import (Qt, QThread, QPropertyAnimation,
+from PyQt5.QtCore import (Qt, QPropertyAnimation,
                           QEasingCurve, QParallelAnimationGroup)
 from PyQt5.QtGui import QColor, QIcon, QTextCursor
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit,
     QPushButton, QFileDialog, QHBoxLayout, QTextEdit, QFrame, QGraphicsDropShadowEffect,
     QTabWidget, QPlainTextEdit, QTableWidget, QTableWidgetItem, QProgressBar,
-    QComboBox, QGroupBox
+    QComboBox, QGroupBox, QSpinBox, QMenu, QCheckBox, QInputDialog
 )
 
 # 导入功能类
-from downloadWorker import DownloadWorker
+from bandwidthLimiter import bandwidth_limiter
+from cookieJars import cookie_file_cache
+from cookieLibrary import CookieLibrary
+from downloadArchive import download_archive, preload_extractors
+from downloadScheduler import (DownloadJob, DownloadScheduler,
+                               DEFAULT_MAX_CONCURRENCY, MAX_CONCURRENCY_LIMIT)
+from downloadWorker import DownloadWorker, OUTCOME_DONE, OUTCOME_PAUSED, OUTCOME_RETRY, STOP_PAUSE
 from historyManager import HistoryManager
+from jobJournal import (JobJournal, STATE_DONE, STATE_FAILED, STATE_QUEUED, STATE_SKIPPED,
+                        STATE_PAUSED, STATE_CANCELLED)
 from logSyntaxHighlighter import LogSyntaxHighlighter
+from metadataProbe import MetadataProbe, estimate_filesize, video_key
+from playlistExpander import PlaylistExpander, parse_item_range
+from retryPolicy import ERROR_PERMANENT
+from syncSources import SyncSourceStore
 from translate_data import translations
+from ydlSessionPool import session_pool
 
 # 设置应用程序ID
 appId = "CyberDL"
@@ -45,9 +58,21 @@ class HDDownloader(QWidget):
         self.current_language = 'en'  # 当前语言设置，默认英文
         self.translations = translations  # 多语言翻译数据
 
-        self.workers = []  # 存储工作线程对象
-        self.worker_threads = []  # 存储线程对象
-        self.cookie_files = []  # 存储Cookie文件信息
+        self.jobs = {}  # 存储下载任务 job_id -> DownloadJob
+        self.probes = []  # 正在进行的批量预检
+        self.expanders = []  # 正在展开的播放列表
+        self.journal = JobJournal()  # 持久化任务日志，用于崩溃后恢复任务
+        self.sync_sources = SyncSourceStore()  # 保存的播放列表/频道同步源
+        self.scheduler = DownloadScheduler(DEFAULT_MAX_CONCURRENCY)  # 下载任务调度器
+        self.scheduler.host_budget_changed.connect(self.on_host_budget_changed)
+        self.scheduler.job_retry_scheduled.connect(self.on_job_retry_scheduled)
+        self.scheduler.job_paused.connect(self.on_job_paused)
+        self.scheduler.job_cancelled.connect(self.on_job_cancelled)
+        self.scheduler.job_finished.connect(self.on_job_finished)
+        self.scheduler.job_started.connect(self.release_playlist_credit)
+        preload_extractors()  # 后台导入yt-dlp提取器列表，入队时按URL查询归档不再等待导入
+        self.cookie_library = CookieLibrary(os.path.join(os.getcwd(), "cookies"))  # 已上传Cookie文件的索引
+        self.cookie_files = []  # 存储Cookie文件信息（CookieFileEntry）
         self.current_cookie_file = None  # 当前选中的Cookie文件
 
         # 窗口基础尺寸设置
@@ -108,6 +133,9 @@ class HDDownloader(QWidget):
         # 加载QSS样式表
         self.load_styles()
 
+        # 恢复上次关闭或崩溃时未完成的任务
+        self.restore_unfinished_jobs()
+
     def load_styles(self):
         """
         加载QSS样式表
@@ -248,12 +276,42 @@ class HDDownloader(QWidget):
         self.quality_combo.addItem("480", "480")
         self.quality_combo.addItem("360", "360")
 
+        # 并发数标签
+        self.concurrency_label = QLabel()
+        self.concurrency_label.setObjectName("concurrency_label")
+
+        # 并发数选择框
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setObjectName("concurrency_spin")
+        self.concurrency_spin.setMaximumHeight(50)
+        self.concurrency_spin.setRange(1, MAX_CONCURRENCY_LIMIT)
+        self.concurrency_spin.setValue(DEFAULT_MAX_CONCURRENCY)
+        self.concurrency_spin.valueChanged.connect(self.scheduler.set_max_concurrency)
+
+        # 全局限速标签
+        self.rate_limit_label = QLabel()
+        self.rate_limit_label.setObjectName("rate_limit_label")
+
+        # 全局限速输入框（KB/s，0表示不限速），所有并发任务共享
+        self.rate_limit_spin = QSpinBox()
+        self.rate_limit_spin.setObjectName("rate_limit_spin")
+        self.rate_limit_spin.setMaximumHeight(50)
+        self.rate_limit_spin.setRange(0, 1000000)
+        self.rate_limit_spin.setSingleStep(256)
+        self.rate_limit_spin.setSuffix(" KB/s")
+        self.rate_limit_spin.setValue(0)
+        self.rate_limit_spin.valueChanged.connect(self.on_rate_limit_changed)
+
         # 将控件添加到水平布局
         control_row.addWidget(self.cookie_combo)
         control_row.addWidget(self.cookie_upload_button)
         control_row.addWidget(self.cookie_delete_button)
         control_row.addWidget(self.quality_label)
         control_row.addWidget(self.quality_combo)
+        control_row.addWidget(self.concurrency_label)
+        control_row.addWidget(self.concurrency_spin)
+        control_row.addWidget(self.rate_limit_label)
+        control_row.addWidget(self.rate_limit_spin)
 
         # 设置控件拉伸因子，均匀分布
         control_row.setStretch(0, 4)  # Cookie下拉框占4份
@@ -261,9 +319,40 @@ class HDDownloader(QWidget):
         control_row.setStretch(2, 2)  # 删除按钮占2份
         control_row.setStretch(3, 1)  # 标签占1份
         control_row.setStretch(4, 2)  # 清晰度下拉框占2份
+        control_row.setStretch(5, 1)  # 并发数标签占1份
+        control_row.setStretch(6, 1)  # 并发数选择框占1份
+        control_row.setStretch(7, 1)  # 限速标签占1份
+        control_row.setStretch(8, 2)  # 限速输入框占2份
 
         cookie_layout.addLayout(control_row)
 
+        # 播放列表模式：展开播放列表/频道中的视频，可限定条目范围
+        playlist_row = QHBoxLayout()
+        playlist_row.setSpacing(15)
+        self.playlist_checkbox = QCheckBox()
+        self.playlist_checkbox.setObjectName("playlist_checkbox")
+        self.playlist_range_input = QLineEdit()
+        self.playlist_range_input.setObjectName("playlist_range_input")
+        self.playlist_range_input.setMaximumHeight(50)
+        self.playlist_range_input.setEnabled(False)
+        self.playlist_checkbox.toggled.connect(self.playlist_range_input.setEnabled)
+        self.sync_button = QPushButton()
+        self.sync_button.setObjectName("sync_button")
+        self.sync_button.setMaximumHeight(50)
+        self.sync_button.clicked.connect(self.sync_playlists)
+        playlist_row.addWidget(self.playlist_checkbox)
+        playlist_row.addWidget(self.playlist_range_input)
+        # 流式合并：分离的音视频流不落盘，ffmpeg边下载边写入最终文件
+        self.stream_mux_checkbox = QCheckBox()
+        self.stream_mux_checkbox.setObjectName("stream_mux_checkbox")
+        playlist_row.addWidget(self.sync_button)
+        playlist_row.addWidget(self.stream_mux_checkbox)
+        playlist_row.setStretch(0, 1)
+        playlist_row.setStretch(1, 2)
+        playlist_row.setStretch(2, 1)
+        playlist_row.setStretch(3, 1)
+        cookie_layout.addLayout(playlist_row)
+
         download_layout.addWidget(cookie_group)
 
         # ================= 操作按钮区（统一风格） =================
@@ -316,6 +405,8 @@ class HDDownloader(QWidget):
         self.task_table.setColumnWidth(1, 120)
         self.task_table.setColumnWidth(2, 420)
         self.task_table.horizontalHeader().setStretchLastSection(True)
+        self.task_table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.task_table.customContextMenuRequested.connect(self.task_table_right_click)
         download_layout.addWidget(self.task_table)
 
         # ================= 历史页 =================
@@ -701,6 +792,8 @@ class HDDownloader(QWidget):
             item.setForeground(QColor("#FF5252"))  # 红色
         elif "downloading" in status or "processing" in status or "下载中" in status:
             item.setForeground(QColor("#2196F3"))  # 蓝色
+        elif "paused" in status or "cancelled" in status or "暂停" in status or "取消" in status:
+            item.setForeground(QColor("#94A3B8"))  # 灰色
         else:
             item.setForeground(QColor("#E2E8F0"))  # 默认白色
 
@@ -755,8 +848,9 @@ class HDDownloader(QWidget):
 
     # ================= Cookie文件管理 =================
     def load_cookie_files(self):
-        """加载已有的Cookie文件"""
-        self.cookie_files = []
+        """加载已有的Cookie文件（增量刷新Cookie库，只解析新增或修改过的文件）"""
+        self.cookie_library.refresh()
+        self.cookie_files = self.cookie_library.files()
         self.cookie_combo.clear()
 
         # 添加自动获取选项
@@ -765,30 +859,31 @@ class HDDownloader(QWidget):
         # 添加无Cookie选项
         self.cookie_combo.addItem(self._tr("不使用Cookie", "No Cookie"), "no_cookie")
 
-        # 检查cookies目录
-        cookie_dir = os.path.join(os.getcwd(), "cookies")
-        if not os.path.exists(cookie_dir):
-            os.makedirs(cookie_dir)
+        # 添加按网站自动选择选项
+        self.cookie_combo.addItem(self._tr("按网站自动选择Cookie文件", "Match cookie file by site"), "by_site")
 
         # 加载目录中的cookie文件
-        for file_name in os.listdir(cookie_dir):
-            if file_name.endswith('.txt'):
-                file_path = os.path.join(cookie_dir, file_name)
-                if os.path.getsize(file_path) > 10:  # 只加载非空文件
-                    file_size = os.path.getsize(file_path)
-                    modified_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d')
-
-                    file_info = {
-                        'name': file_name,
-                        'path': file_path,
-                        'size': file_size,
-                        'modified': modified_time
-                    }
-                    self.cookie_files.append(file_info)
-
-                    # 添加到下拉框
-                    display_text = f"{file_name} ({file_size}字节, {modified_time})"
-                    self.cookie_combo.addItem(display_text, file_path)
+        for entry in self.cookie_files:
+            # 添加到下拉框，悬停显示文件覆盖的域名
+            display_text = f"{entry.name} ({entry.size}字节, {entry.modified})"
+            self.cookie_combo.addItem(display_text, entry.path)
+            self.cookie_combo.setItemData(self.cookie_combo.count() - 1,
+                                          ', '.join(sorted(entry.domains)), Qt.ToolTipRole)
+
+    def cookie_file_for(self, url):
+        """
+        按当前Cookie选择确定URL使用的cookie文件
+
+        按网站自动选择时从Cookie库中查找覆盖该URL域名的文件，
+        没有匹配的文件时退回自动获取浏览器Cookie。
+
+        Returns:
+            str: cookie文件路径；None表示自动获取浏览器Cookie，"no_cookie"表示不使用
+        """
+        if self.current_cookie_file == "by_site":
+            entry = self.cookie_library.match(url)
+            return entry.path if entry else None
+        return self.current_cookie_file
 
     def _tr(self, zh, en):
         """翻译辅助函数"""
@@ -796,7 +891,7 @@ class HDDownloader(QWidget):
 
     def on_cookie_selected(self, index):
         """Cookie文件选择改变"""
-        if index > 1:
+        if index > 2:
             file_path = self.cookie_combo.itemData(index)
             self.current_cookie_file = file_path
             self.cookie_delete_button.setEnabled(True)
@@ -825,6 +920,16 @@ class HDDownloader(QWidget):
                 self._tr("已选择不使用Cookie", "Selected no cookie"),
                 "info"
             )
+        elif index == 2:  # 按网站自动选择Cookie文件
+            self.current_cookie_file = "by_site"
+            self.cookie_delete_button.setEnabled(False)
+
+            # 显示选择信息到日志框
+            self.show_cookie_message(
+                self._tr(f"已选择按网站自动选择Cookie文件（{len(self.cookie_files)}个文件）",
+                         f"Selected matching cookie files by site ({len(self.cookie_files)} files)"),
+                "info"
+            )
 
     def upload_cookie_file(self):
         """上传Cookie文件"""
@@ -887,7 +992,7 @@ class HDDownloader(QWidget):
 
     def delete_cookie_file(self):
         """删除选中的Cookie文件"""
-        if not self.current_cookie_file or self.current_cookie_file in [None, "no_cookie"]:
+        if not self.current_cookie_file or self.current_cookie_file in [None, "no_cookie", "by_site"]:
             return
 
         file_name = os.path.basename(self.current_cookie_file)
@@ -900,6 +1005,7 @@ class HDDownloader(QWidget):
 
         try:
             os.remove(self.current_cookie_file)
+            cookie_file_cache.forget(self.current_cookie_file)
             self.load_cookie_files()  # 重新加载
             self.cookie_combo.setCurrentIndex(0)  # 选择"自动获取浏览器Cookie"
 
@@ -955,47 +1061,425 @@ class HDDownloader(QWidget):
             "info"
         )
 
+        # 按网站自动选择时，本批次入队前增量刷新一次Cookie库
+        if self.current_cookie_file == "by_site":
+            self.cookie_library.refresh()
+
+        # 播放列表模式：逐页展开条目并边展开边下载
+        if self.playlist_checkbox.isChecked():
+            item_range = self.playlist_range_input.text().strip()
+            try:
+                parse_item_range(item_range)
+            except ValueError:
+                self.show_cookie_message(
+                    self._tr(f"条目范围格式不正确: {item_range}", f"Invalid item range: {item_range}"),
+                    "error"
+                )
+                return
+            for url in urls:
+                self.start_playlist_expansion(url, folder, quality, item_range)
+            return
+
+        # 跳过下载归档中已存在且文件仍然有效的视频
+        urls = self.skip_archived_urls(urls)
+        if not urls:
+            return
+
+        # 批量模式先并行预检所有URL，解析成功的任务再进入下载队列
+        if self.batch_mode and len(urls) > 1:
+            self.start_preflight(urls, folder, quality)
+            return
+
         # 启动每个URL的下载任务
         for url in urls:
             self.start_download_task(url, folder, quality)
 
+    def skip_archived_urls(self, urls):
+        """
+        过滤掉已下载过的URL
+
+        Args:
+            urls (list): 待下载的URL列表
+
+        Returns:
+            list: 仍需下载的URL列表
+        """
+        remaining = []
+        skipped = 0
+        for url in urls:
+            filepath = download_archive.lookup(url)
+            if filepath:
+                skipped += 1
+                self.append_log(self._tr(f"已下载，跳过: {url} -> {filepath}",
+                                         f"Already downloaded, skipped: {url} -> {filepath}"))
+            else:
+                remaining.append(url)
+
+        if skipped:
+            self.show_cookie_message(
+                self._tr(f"跳过 {skipped} 个已下载的视频", f"Skipped {skipped} already downloaded videos"),
+                "success"
+            )
+        return remaining
+
     def start_download_task(self, url, folder, quality):
         """
-        启动单个下载任务
+        创建单个下载任务并提交到调度器
+
+        任务先以“Waiting”状态加入任务表，由调度器在有空闲槽位时
+        分配到常驻工作线程执行。
 
         Args:
             url (str): 视频URL地址
             folder (str): 保存文件夹路径
             quality (str): 视频清晰度
         """
+        job = self.create_download_job(url, folder, quality)
+        self.scheduler.submit(job)
+
+    def sync_playlists(self):
+        """
+        增量同步播放列表/频道
+
+        输入框中有URL时将其保存为同步源（使用当前保存目录和清晰度）并同步；
+        输入框为空时同步所有已保存的源。每个源只展开上次同步之后的新条目。
+        """
+        if self.batch_mode:
+            urls = [u.strip() for u in self.url_input_multiline.toPlainText().splitlines() if u.strip()]
+        else:
+            urls = [self.url_input.text().strip()] if self.url_input.text().strip() else []
+
+        if urls:
+            folder = self.folder_path.text().strip()
+            if not folder:
+                self.show_cookie_message(
+                    self.translations['error_empty_fields'][self.current_language],
+                    "error"
+                )
+                return
+            for url in urls:
+                self.sync_sources.add(url, folder, self.quality_combo.currentData())
+            sources = [self.sync_sources.get(url) for url in urls]
+        else:
+            sources = self.sync_sources.sources()
+
+        if not sources:
+            self.show_cookie_message(
+                self._tr("没有已保存的同步源", "No saved sync sources"),
+                "warning"
+            )
+            return
+
+        for source in sources:
+            self.start_playlist_expansion(source['url'], source['folder'], source['quality'],
+                                          sync_source=source)
+
+    def start_playlist_expansion(self, url, folder, quality, item_range='', sync_source=None):
+        """
+        展开播放列表或频道，发现的条目逐个进入下载队列
+
+        Args:
+            url (str): 播放列表/频道URL
+            folder (str): 保存文件夹路径
+            quality (str): 视频清晰度
+            item_range (str): 条目范围，如 "1-50"，为空表示全部
+            sync_source (dict): 同步源记录，不为None时只展开新增条目
+        """
+        cookie_file = self.cookie_file_for(url)
+        if cookie_file == "no_cookie" or (cookie_file and not os.path.isfile(cookie_file)):
+            cookie_file = None
+
+        if sync_source is not None:
+            expander = PlaylistExpander(url, cookie_file=cookie_file, sync=True,
+                                        high_water=sync_source['high_water'])
+        else:
+            expander = PlaylistExpander(url, item_range, cookie_file)
+
+        def on_entry(entry):
+            job = self.create_download_job(entry['url'], folder, quality)
+            job.source = expander
+            if expander.sync:
+                job.sync_run = expander
+                expander.track(job.job_id)
+            self.scheduler.submit(job)
+
+        expander.entry_found.connect(on_entry)
+        def on_failed(msg):
+            if expander.sync:
+                text = self._tr(f"同步失败 {url}: {msg}", f"Sync failed for {url}: {msg}")
+            else:
+                text = self._tr(f"展开播放列表失败: {msg}", f"Playlist expansion failed: {msg}")
+            self.show_cookie_message(text, "error")
+
+        expander.failed.connect(on_failed)
+        expander.finished.connect(lambda queued, skipped: self.on_playlist_finished(expander, queued, skipped))
+        self.expanders.append(expander)
+
+        self.show_cookie_message(
+            self._tr(f"开始展开播放列表: {url}", f"Expanding playlist: {url}"),
+            "info"
+        )
+        expander.start()
+
+    def on_playlist_finished(self, expander, queued, skipped):
+        """
+        播放列表展开完成
+
+        Args:
+            expander (PlaylistExpander): 展开器
+            queued (int): 入队的条目数
+            skipped (int): 已下载而跳过的条目数
+        """
+        if expander in self.expanders:
+            self.expanders.remove(expander)
+        if expander.sync:
+            expander.expanded = True
+            self.finish_sync(expander)
+            if expander.error is not None:
+                # 失败信息已由failed信号显示，已入队的任务照常下载，高水位标记保持不变
+                return
+            self.show_cookie_message(
+                self._tr(f"同步完成 {expander.url}：{queued} 个新视频",
+                         f"Synced {expander.url}: {queued} new videos"),
+                "success"
+            )
+            return
+        if expander.error is not None:
+            # 失败信息已由failed信号显示
+            return
+        self.show_cookie_message(
+            self._tr(f"播放列表展开完成：{queued} 个入队，{skipped} 个已下载",
+                     f"Playlist expanded: {queued} queued, {skipped} already downloaded"),
+            "success"
+        )
+
+    def finish_sync(self, expander):
+        """
+        同步的展开和所有入队任务都结束后推进高水位标记
+
+        有任务失败或被取消时保留原标记，下次同步重新检查这些条目。
+
+        Args:
+            expander (PlaylistExpander): 同步展开器
+        """
+        if not expander.settled:
+            return
+        if expander.error is None and not expander.stopped and expander.jobs_failed == 0:
+            self.sync_sources.mark_synced(expander.url, expander.newest_key)
+
+    def on_sync_job_done(self, job, succeeded):
+        """
+        同步入队的任务已结束（成功、失败或取消）
+
+        Args:
+            job (DownloadJob): 下载任务
+            succeeded (bool): 是否下载成功
+        """
+        expander, job.sync_run = job.sync_run, None
+        if expander is not None and expander.job_done(job.job_id, succeeded):
+            self.finish_sync(expander)
+
+    @staticmethod
+    def release_playlist_credit(job):
+        """播放列表条目开始下载或被取消后，允许展开器继续读取"""
+        if job.source is not None:
+            job.source.release()
+            job.source = None
+
+    def restore_unfinished_jobs(self):
+        """
+        从任务日志恢复未完成的任务
+
+        按原参数重新入队，yt-dlp会从已有的 .part 文件继续下载；
+        已在下载归档中的任务直接标记为完成。
+        """
+        self.journal.prune()
+        restored = 0
+        for entry in self.journal.unfinished():
+            if download_archive.lookup(entry['url']):
+                self.journal.set_state(entry['journal_id'], STATE_DONE)
+                continue
+            job = self.create_download_job(entry['url'], entry['folder'], entry['quality'],
+                                           entry['cookie_file'], entry['journal_id'])
+            if entry['state'] == STATE_PAUSED:
+                # 暂停的任务保持暂停，等待手动继续
+                job.worker.request_stop(STOP_PAUSE)
+            self.scheduler.submit(job)
+            restored += 1
+
+        if restored:
+            self.show_cookie_message(
+                self._tr(f"已恢复 {restored} 个未完成的任务", f"Restored {restored} unfinished tasks"),
+                "success"
+            )
+
+    def start_preflight(self, urls, folder, quality):
+        """
+        批量模式的元数据预检
+
+        为每个URL创建任务行后并行提取信息（不下载），逐个回填标题与
+        估算大小；解析成功的任务直接基于提取结果进入下载队列，
+        失效链接和重复项不会进入下载队列。每个站点同时解析的数量
+        不超过调度器给该站点的并发预算。
+
+        Args:
+            urls (list): 视频URL列表
+            folder (str): 保存文件夹路径
+            quality (str): 视频清晰度
+        """
+        jobs = [self.create_download_job(url, folder, quality) for url in urls]
+        probe = MetadataProbe(jobs, {job.host: self.scheduler.host_budget(job.host) for job in jobs})
+        probe.resolved.connect(self.on_preflight_resolved)
+        probe.failed.connect(self.on_preflight_failed)
+        probe.finished.connect(lambda ok, total, size: self.on_preflight_finished(probe, ok, total, size))
+        self.probes.append(probe)
+
+        self.show_cookie_message(
+            self._tr(f"开始预检 {len(jobs)} 个链接...", f"Pre-flight checking {len(jobs)} links..."),
+            "info"
+        )
+        probe.start()
+
+    def on_preflight_resolved(self, job, info):
+        """
+        单个任务预检成功
+
+        Args:
+            job (DownloadJob): 下载任务
+            info (dict): 提取到的视频信息
+        """
+        plan = job.worker.plan
+        size = estimate_filesize(info, plan)
+        title = info.get('title') or job.url
+        size_text = f" ({size / 1024 / 1024:.1f} MB)" if size else ""
+        if plan is not None and plan.needs_reencode:
+            size_text += self._tr(" [需转码]", " [re-encode]")
+        url_item = self.task_table.item(job.row, 0)
+        if url_item:
+            url_item.setText(f"{title}{size_text}")
+            url_item.setToolTip(job.url)
+
+        if job.duplicate:
+            job.worker.cleanup()
+            self.journal.set_state(job.journal_id, STATE_SKIPPED)
+            self.set_task_status(job.row, "Duplicate")
+            self.task_table.item(job.row, 3).setText(self._tr("重复", "Duplicate"))
+            return
+
+        # 不同URL指向已下载过的同一视频时同样跳过
+        key = video_key(info)
+        filepath = download_archive.lookup_key(*key) if key else None
+        if filepath:
+            job.worker.cleanup()
+            self.journal.set_state(job.journal_id, STATE_SKIPPED)
+            self.set_task_status(job.row, "Skipped")
+            self.task_table.item(job.row, 3).setText(self._tr("已下载", "Already downloaded"))
+            self.append_log(self._tr(f"已下载，跳过: {job.url} -> {filepath}",
+                                     f"Already downloaded, skipped: {job.url} -> {filepath}"))
+            return
+
+        self.scheduler.submit(job)
+
+    def on_preflight_failed(self, job, msg, error_class):
+        """
+        单个任务预检失败
+
+        只有永久错误（失效链接、私有视频等）直接判定失败；限流、超时等
+        错误交给调度器，下载阶段重新提取信息并按重试策略退避。
+
+        Args:
+            job (DownloadJob): 下载任务
+            msg (str): 错误信息
+            error_class (str): classify_error返回的错误类别
+        """
+        if error_class != ERROR_PERMANENT:
+            self.journal.set_state(job.journal_id, STATE_QUEUED)
+            self.append_log(self._tr(f"预检未完成（{error_class}），直接进入下载队列: {job.url} - {msg[:100]}",
+                                     f"Pre-flight incomplete ({error_class}), queued for download: "
+                                     f"{job.url} - {msg[:100]}"))
+            self.scheduler.submit(job)
+            return
+
+        self.journal.set_state(job.journal_id, STATE_FAILED, msg)
+        self.set_task_status(job.row, "Failed")
+        self.task_table.item(job.row, 3).setText(msg[:100])
+        self.show_cookie_message(
+            self._tr(f"预检失败: {job.url} - {msg}", f"Pre-flight failed: {job.url} - {msg}"),
+            "error"
+        )
+
+    def on_preflight_finished(self, probe, ok_count, total, total_bytes):
+        """
+        批量预检全部完成，汇总可下载数量与总大小
+
+        Args:
+            probe (MetadataProbe): 完成的预检对象
+            ok_count (int): 可下载的任务数
+            total (int): 任务总数
+            total_bytes (int): 估算总字节数
+        """
+        if probe in self.probes:
+            self.probes.remove(probe)
+        self.show_cookie_message(
+            self._tr(f"预检完成：{ok_count}/{total} 个可下载，预计总大小 {total_bytes / 1024 / 1024:.1f} MB",
+                     f"Pre-flight done: {ok_count}/{total} downloadable, "
+                     f"estimated total {total_bytes / 1024 / 1024:.1f} MB"),
+            "success"
+        )
+
+    def set_task_status(self, row, status):
+        """
+        更新任务表中指定行的状态并设置颜色
+
+        Args:
+            row (int): 任务行索引
+            status (str): 状态文本
+        """
+        item = self.task_table.item(row, 1)
+        if item:
+            item.setText(status)
+            self.set_status_color(item, status)
+
+    def create_download_job(self, url, folder, quality, cookie_file=None, journal_id=None):
+        """
+        创建下载任务：添加任务行、创建DownloadWorker并连接信号
+
+        Args:
+            url (str): 视频URL地址
+            folder (str): 保存文件夹路径
+            quality (str): 视频清晰度
+            cookie_file (str): 恢复任务时使用的cookie文件，新任务按当前选择确定
+            journal_id (str): 恢复任务时的日志ID，为None表示新任务
+
+        Returns:
+            DownloadJob: 尚未提交到调度器的任务
+        """
         # 添加任务到表格
         row, progress_bar = self.add_task_row(url)
 
-        # 确定要使用的cookie文件
-        cookie_file = None
-        if self.current_cookie_file:
-            if self.current_cookie_file != "no_cookie":
-                cookie_file = self.current_cookie_file
+        # 确定要使用的cookie文件（按网站自动选择时每个URL各自匹配）
+        if journal_id is None:
+            cookie_file = self.cookie_file_for(url)
 
-        # 创建工作线程（传递cookie_file和quality参数）
-        worker = DownloadWorker(url, folder, self.current_language, cookie_file, quality)
-        thread = QThread()
+        job = DownloadJob(url, folder, quality, cookie_file, row, journal_id)
+        if journal_id is None:
+            self.journal.add(job)
 
-        # 将工作线程移动到新线程
-        worker.moveToThread(thread)
+        # 创建下载执行对象（传递cookie_file和quality参数），由调度器在工作线程中执行
+        worker = DownloadWorker(url, folder, self.current_language, cookie_file, quality)
+        worker.stream_mux = self.stream_mux_checkbox.isChecked()
+        job.worker = worker
 
         # 连接信号和槽
         worker.progress_signal.connect(progress_bar.setValue)
 
         def update_status(status):
             """更新状态并设置颜色"""
-            item = self.task_table.item(row, 1)
-            if item:
-                item.setText(status)
-                self.set_status_color(item, status)
+            self.set_task_status(row, status)
 
         worker.status_signal.connect(update_status)
         worker.log_signal.connect(self.append_log)
+        worker.stage_signal.connect(lambda stage: self.journal.set_state(job.journal_id, stage))
 
         # 连接Cookie相关信号
         worker.cookie_info_signal.connect(lambda msg: self.show_cookie_message(msg, "info"))
@@ -1005,7 +1489,7 @@ class HDDownloader(QWidget):
 
         # 连接完成信号
         def on_finished():
-            thread.quit()
+            self.journal.set_state(job.journal_id, STATE_DONE)
             self.task_table.item(row, 3).setText("Succeed")
             self.add_to_history(
                 url, self.translations['status_complete'][self.current_language]
@@ -1015,6 +1499,7 @@ class HDDownloader(QWidget):
 
         # 连接错误信号
         def on_error(msg):
+            self.journal.set_state(job.journal_id, STATE_FAILED, msg)
             update_status("Failed")
             self.show_cookie_message(
                 self._tr(f"下载失败: {msg}", f"Download failed: {msg}"),
@@ -1023,13 +1508,126 @@ class HDDownloader(QWidget):
 
         worker.error_signal.connect(on_error)
 
-        # 启动线程
-        thread.started.connect(worker.run)
-        thread.start()
+        # 保存任务引用
+        self.jobs[job.job_id] = job
+        return job
+
+    def job_at_row(self, row):
+        """返回任务表指定行对应的任务"""
+        for job in self.jobs.values():
+            if job.row == row:
+                return job
+        return None
+
+    def task_table_right_click(self, pos):
+        """
+        任务表右键菜单：暂停、继续、取消单个任务或全部任务
+
+        Args:
+            pos (QPoint): 点击位置
+        """
+        lang = self.current_language
+        menu = QMenu(self)
+        idx = self.task_table.indexAt(pos)
+        job = self.job_at_row(idx.row()) if idx.isValid() else None
+        if job is not None:
+            if self.scheduler.is_paused(job):
+                menu.addAction(self.translations['resume_action'][lang], lambda: self.scheduler.resume(job))
+            elif job.worker.outcome in (None, OUTCOME_RETRY):
+                menu.addAction(self.translations['pause_action'][lang], lambda: self.scheduler.pause(job))
+            if job.worker.outcome in (None, OUTCOME_RETRY, OUTCOME_PAUSED):
+                menu.addAction(self.translations['cancel_action'][lang], lambda: self.scheduler.cancel(job))
+            menu.addAction(self.translations['host_rate_action'][lang], lambda: self.edit_host_rate_limit(job.host))
+            menu.addSeparator()
+
+        menu.addAction(self.translations['pause_all_action'][lang], self.scheduler.pause_all)
+        menu.addAction(self.translations['resume_all_action'][lang], self.scheduler.resume_all)
+        menu.addAction(self.translations['cancel_all_action'][lang], self.scheduler.cancel_all)
+        menu.exec_(self.task_table.viewport().mapToGlobal(pos))
+
+    def on_job_paused(self, job):
+        """任务已暂停，槽位已释放"""
+        self.journal.set_state(job.journal_id, STATE_PAUSED)
+        self.set_task_status(job.row, self._tr("已暂停", "Paused"))
+
+    def on_job_finished(self, job):
+        """任务已结束（下载成功或重试后仍失败）"""
+        self.on_sync_job_done(job, job.worker.outcome == OUTCOME_DONE)
+
+    def on_job_cancelled(self, job):
+        """任务已取消，部分数据已删除"""
+        self.release_playlist_credit(job)
+        self.on_sync_job_done(job, False)
+        self.journal.set_state(job.journal_id, STATE_CANCELLED)
+        self.set_task_status(job.row, self._tr("已取消", "Cancelled"))
+        self.task_table.item(job.row, 3).setText(self._tr("已取消", "Cancelled"))
+
+    def on_job_retry_scheduled(self, job, delay):
+        """
+        任务失败后等待重试，期间不占用下载槽位
+
+        Args:
+            job (DownloadJob): 下载任务
+            delay (float): 重新入队前的等待秒数
+        """
+        self.journal.set_state(job.journal_id, STATE_QUEUED)
+        self.set_task_status(job.row, self._tr(f"等待重试 ({delay:.0f}秒)...",
+                                               f"Retrying in {delay:.0f}s..."))
+
+    def on_rate_limit_changed(self, value):
+        """
+        修改全局限速，立即作用于所有正在下载的任务
+
+        Args:
+            value (int): 限速（KB/s），0表示不限速
+        """
+        bandwidth_limiter.set_rate(value * 1024)
+
+    def edit_host_rate_limit(self, host):
+        """
+        修改单个站点的限速，与全局限速同时生效
+
+        Args:
+            host (str): 站点
+        """
+        lang = self.current_language
+        current = int((bandwidth_limiter.host_rate(host) or 0) / 1024)
+        value, ok = QInputDialog.getInt(
+            self, self.translations['host_rate_action'][lang],
+            self.translations['host_rate_prompt'][lang].format(host=host),
+            current, 0, 1000000, 256
+        )
+        if ok:
+            self.on_host_rate_limit_changed(host, value)
+
+    def on_host_rate_limit_changed(self, host, value):
+        """
+        修改站点限速，立即作用于该站点正在下载的任务
 
-        # 保存工作线程和线程对象引用
-        self.workers.append(worker)
-        self.worker_threads.append(thread)
+        Args:
+            host (str): 站点
+            value (int): 限速（KB/s），0表示取消该站点的限速
+        """
+        bandwidth_limiter.set_host_rate(host, value * 1024)
+        if value:
+            message = self._tr(f"站点 {host} 限速 {value} KB/s", f"Rate limit for {host}: {value} KB/s")
+        else:
+            message = self._tr(f"已取消站点 {host} 的限速", f"Removed rate limit for {host}")
+        self.append_log(message)
+
+    def on_host_budget_changed(self, host, budget):
+        """
+        站点并发预算变化时记录日志
+
+        Args:
+            host (str): 站点
+            budget (int): 新的并发预算
+        """
+        self.show_cookie_message(
+            self._tr(f"站点 {host} 的并发数调整为 {budget}",
+                     f"Concurrency for {host} adjusted to {budget}"),
+            "info"
+        )
 
     # ================= 语言 & UI =================
     def toggle_batch_mode(self):
@@ -1092,14 +1690,28 @@ class HDDownloader(QWidget):
         # 更新清晰度标签
         self.quality_label.setText(self.translations['quality_label'][lang])
 
+        # 更新并发数标签
+        self.concurrency_label.setText(self.translations['concurrency_label'][lang])
+
+        # 更新限速标签
+        self.rate_limit_label.setText(self.translations['rate_limit_label'][lang])
+        self.rate_limit_spin.setSpecialValueText(self.translations['rate_unlimited'][lang])
+
+        # 更新播放列表模式文本
+        self.playlist_checkbox.setText(self.translations['playlist_mode'][lang])
+        self.playlist_range_input.setPlaceholderText(self.translations['playlist_range_hint'][lang])
+        self.sync_button.setText(self.translations['sync_button'][lang])
+        self.stream_mux_checkbox.setText(self.translations['stream_mux'][lang])
+
         # 更新Cookie相关文本
         self.cookie_upload_button.setText(self.translations['cookie_upload'][lang])
         self.cookie_delete_button.setText(self.translations['cookie_delete'][lang])
 
-        # 更新下拉框的前两个选项
+        # 更新下拉框的前三个选项
         if self.cookie_combo.count() > 1:
             self.cookie_combo.setItemText(0, self.translations['auto_cookie'][lang])
             self.cookie_combo.setItemText(1, self.translations['no_cookie'][lang])
+            self.cookie_combo.setItemText(2, self.translations['cookie_by_site'][lang])
 
         # 更新选项卡文本
         self.tabs.setTabText(0, self.translations['title'][lang])
@@ -1132,6 +1744,23 @@ class HDDownloader(QWidget):
         """
         self.history_manager.add_to_history(url, status)
 
+    def closeEvent(self, event):
+        """
+        窗口关闭事件处理
+
+        停止下载调度器并退出所有常驻工作线程，关闭会话池中的连接，
+        写入剩余的历史记录。
+
+        Args:
+            event: QCloseEvent对象
+        """
+        for expander in self.expanders:
+            expander.stop()
+        self.scheduler.shutdown()
+        session_pool.close_all()
+        self.history_manager.shutdown()
+        super().closeEvent(event)
+
     def clear_log(self):
         """
         清空日志
@@ -0,0 +1,133 @@
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from retryPolicy import classify_error, ERROR_RATE_LIMITED
+
+PREFLIGHT_CONCURRENCY = 8  # 预检阶段并行解析的URL数量
+
+
+def estimate_filesize(info, plan=None):
+    """
+    估算视频最终下载的字节数
+
+    优先使用格式方案的计划字节数，其次是所选格式（含分离的音视频流）
+    的精确大小，否则使用近似大小。
+
+    Args:
+        info (dict): yt-dlp提取到的视频信息
+        plan (FormatPlan): 格式方案（可选）
+
+    Returns:
+        int: 估算字节数，未知时为0
+    """
+    if plan is not None and plan.planned_bytes:
+        return plan.planned_bytes
+    formats = info.get('requested_formats') or [info]
+    total = 0
+    for fmt in formats:
+        total += fmt.get('filesize') or fmt.get('filesize_approx') or 0
+    return int(total)
+
+
+def video_key(info):
+    """返回用于识别重复视频的 (提取器, 视频ID)"""
+    extractor = info.get('extractor_key') or info.get('extractor') or ''
+    video_id = info.get('id')
+    if not video_id:
+        return None
+    return extractor.lower(), str(video_id)
+
+
+class MetadataProbe(QObject):
+    """
+    批量模式的元数据预检阶段
+
+    在真正下载前并行对每个任务执行 extract_info(download=False)，
+    逐个回报标题、格式、估算大小和重复项；解析失败（失效链接、
+    私有视频等）的任务在几秒内即可发现。失败按retryPolicy分类后回报，
+    只有永久错误才应直接判定失败。
+    同一站点同时解析的数量不超过调度器给该站点的并发预算，遇到限流后
+    该站点剩余的任务逐个解析。
+    信号从线程池中发出，连接到GUI线程对象时自动排队执行。
+    """
+
+    resolved = pyqtSignal(object, object)  # (DownloadJob, info)
+    failed = pyqtSignal(object, str, str)  # (DownloadJob, 错误信息, 错误类别)
+    finished = pyqtSignal(int, int, object)  # (可下载数, 总数, 估算总字节数)
+
+    def __init__(self, jobs, host_budgets=None, max_workers=PREFLIGHT_CONCURRENCY, parent=None):
+        """
+        Args:
+            jobs (list): 待预检的DownloadJob
+            host_budgets (dict): 站点 -> 并发预算，在GUI线程中从调度器取得；未列出的站点不单独限制
+            max_workers (int): 总的并行解析数量
+        """
+        super().__init__(parent)
+        self.jobs = list(jobs)
+        self.host_budgets = dict(host_budgets or {})
+        self.max_workers = max_workers
+
+    def start(self):
+        """在后台线程中启动预检，立即返回"""
+        threading.Thread(target=self._run_all, name='preflight', daemon=True).start()
+
+    def _next_job(self, queues, in_flight):
+        """轮流从各站点取出一个未超出并发预算的任务，没有时返回None"""
+        for host, jobs in queues.items():
+            if in_flight.get(host, 0) < self.host_budgets.get(host, self.max_workers):
+                job = jobs.popleft()
+                # 取过任务的站点移到末尾，各站点轮流解析
+                del queues[host]
+                if jobs:
+                    queues[host] = jobs
+                return job
+        return None
+
+    def _run_all(self):
+        seen = set()
+        ok_count = 0
+        total_bytes = 0
+        queues = {}  # 站点 -> 等待解析的任务
+        for job in self.jobs:
+            queues.setdefault(job.host, deque()).append(job)
+        in_flight = {}  # 站点 -> 正在解析的任务数
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='preflight-probe') as pool:
+            futures = {}
+            while queues or futures:
+                while len(futures) < self.max_workers:
+                    job = self._next_job(queues, in_flight)
+                    if job is None:
+                        break
+                    in_flight[job.host] = in_flight.get(job.host, 0) + 1
+                    futures[pool.submit(job.worker.probe)] = job
+
+                # 按完成顺序逐个回报，慢链接不会阻塞其他任务进入下载队列
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = futures.pop(future)
+                    in_flight[job.host] -= 1
+                    try:
+                        info = future.result()
+                    except Exception as e:
+                        error_class = classify_error(e)
+                        if error_class == ERROR_RATE_LIMITED:
+                            self.host_budgets[job.host] = 1
+                        self.failed.emit(job, str(e), error_class)
+                        continue
+
+                    key = video_key(info)
+                    if key is not None and key in seen:
+                        job.duplicate = True
+                    else:
+                        if key is not None:
+                            seen.add(key)
+                        ok_count += 1
+                        total_bytes += estimate_filesize(info, job.worker.plan)
+                    self.resolved.emit(job, info)
+
+        self.finished.emit(ok_count, len(self.jobs), total_bytes)
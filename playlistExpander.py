@@ -0,0 +1,271 @@
+import re
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from yt_dlp.utils import PagedList, PlaylistEntries
+
+from cookieJars import cookie_file_cache
+from downloadArchive import download_archive
+from ydlSessionPool import session_pool
+
+PLAYLIST_PREFETCH = 10  # 已展开但尚未开始下载的条目上限
+PAGE_WINDOW = 50  # 分页列表未提供页大小时每次读取的条目数
+CREDIT_POLL_INTERVAL = 0.5  # 等待下载队列消化时检查停止请求的间隔（秒）
+MAX_URL_RESOLVES = 5  # 逐级解析url结果的最大次数
+
+# 按发布时间从新到旧排列的来源（频道的视频/短视频/直播标签页）；
+# 播放列表等其他来源按原始顺序排列，通常最旧的在前
+_NEWEST_FIRST_PATTERN = re.compile(
+    r'^https?://(?:www\.|m\.)?youtube\.com/(?:@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)'
+    r'/(?:videos|shorts|streams)/?(?:[?#]|$)'
+)
+
+
+def parse_item_range(spec):
+    """
+    解析条目范围，如 "1-50"、"101:200"、"1-10,20,30-"
+
+    只支持正向范围，懒加载时无法从列表末尾倒数。
+
+    Args:
+        spec (str): 范围字符串，为空表示全部
+
+    Returns:
+        tuple: (判断序号是否在范围内的函数, 最大序号；无上限时为None)
+
+    Raises:
+        ValueError: 范围格式不正确
+    """
+    spec = (spec or '').replace(' ', '')
+    if not spec:
+        return (lambda index: True), None
+
+    ranges = []
+    for item in PlaylistEntries.parse_playlist_items(spec):
+        if isinstance(item, int):
+            item = slice(item, item, None)
+        start = item.start if item.start is not None else 1
+        stop = item.stop if item.stop is not None else float('inf')
+        step = item.step or 1
+        if start < 1 or stop < 1 or step < 1:
+            raise ValueError(f'{spec!r}: only positive ranges are supported')
+        ranges.append((start, stop, step))
+
+    def contains(index):
+        return any(start <= index <= stop and (index - start) % step == 0
+                   for start, stop, step in ranges)
+
+    last = max(stop for _, stop, _ in ranges)
+    return contains, (None if last == float('inf') else int(last))
+
+
+def _iter_entries(entries):
+    """
+    逐个产出播放列表条目，不在内存中保留完整列表
+
+    生成器直接迭代（不包装成LazyList）；分页列表每次读取正好一页，
+    读完即清空PagedList自带的页缓存，否则所有读过的页都会留在内存中。
+    """
+    if isinstance(entries, PagedList):
+        window = getattr(entries, '_pagesize', None) or PAGE_WINDOW
+        start = 0
+        while True:
+            page = entries.getslice(start, start + window)
+            getattr(entries, '_cache', {}).clear()
+            if not page:
+                return
+            yield from page
+            if len(page) < window:
+                # 不满一页说明已是最后一页
+                return
+            start += len(page)
+    else:
+        yield from entries or ()
+
+
+def lists_newest_first(url):
+    """来源是否按从新到旧排列，只有这类来源可以在高水位条目处停止翻页"""
+    return bool(_NEWEST_FIRST_PATTERN.match(url)) and 'list=' not in url
+
+
+def entry_key(entry):
+    """条目的 "提取器:视频ID" 标识，用作同步的高水位标记"""
+    if not entry.get('ie_key') or not entry.get('id'):
+        return None
+    return f"{entry['ie_key'].lower()}:{entry['id']}"
+
+
+def entry_url(entry):
+    """从扁平提取的条目中取得可下载的视频URL"""
+    return entry.get('webpage_url') or entry.get('url')
+
+
+class PlaylistExpander(QObject):
+    """
+    播放列表/频道的流式展开器
+
+    在后台线程中以扁平模式（extract_flat）逐页提取条目，每发现一个
+    条目就通过信号交给GUI线程创建下载任务，第一个视频无需等待最后
+    一页即可开始下载。已展开但未开始下载的条目数量受PLAYLIST_PREFETCH
+    限制，下载队列消化后（release）才继续读取下一页，内存占用有上界。
+    已在下载归档中的视频直接跳过。
+
+    同步模式（sync=True）下已下载的条目同样跳过而不停止，播放列表通常
+    最旧的条目在前，新增的视频在末尾。只有按从新到旧排列的来源（频道的
+    视频标签页）会在上次同步的高水位条目处停止翻页；newest_key记录本次
+    看到的第一个条目，本次入队的任务全部成功后由GUI线程保存为新的高水位
+    标记（track/job_done记录入队任务的结果），有任务失败或取消时保留
+    原标记，下次同步从原位置重新检查。
+    """
+
+    entry_found = pyqtSignal(object)  # {'url', 'title', 'index'}
+    failed = pyqtSignal(str)
+    finished = pyqtSignal(int, int)  # (入队数, 跳过数)
+
+    def __init__(self, url, item_range='', cookie_file=None, prefetch=PLAYLIST_PREFETCH,
+                 sync=False, high_water=None, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.cookie_file = cookie_file
+        self.sync = sync
+        self.newest_first = lists_newest_first(url)
+        self.high_water = high_water if self.newest_first else None
+        self.newest_key = None  # 本次看到的第一个条目（仅从新到旧排列的来源）
+        self.error = None
+        self.contains, self.max_index = parse_item_range(item_range)
+        self._credits = threading.Semaphore(prefetch)
+        self._stop = threading.Event()
+        self.queued = 0
+        self.skipped = 0
+        # 以下只在GUI线程中访问
+        self.expanded = False  # 展开已结束（finished信号已处理）
+        self.jobs_failed = 0  # 失败或取消的入队任务数
+        self._outstanding = set()  # 已入队、尚未结束的任务ID
+
+    def start(self):
+        """在后台线程中开始展开，立即返回"""
+        threading.Thread(target=self._run, name='playlist-expand', daemon=True).start()
+
+    def stop(self):
+        """停止展开，已入队的任务不受影响"""
+        self._stop.set()
+        self._credits.release()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def release(self):
+        """一个已展开的条目开始下载（或被取消），允许继续展开下一个"""
+        self._credits.release()
+
+    def track(self, job_id):
+        """记录一个由本次展开入队的任务"""
+        self._outstanding.add(job_id)
+
+    def job_done(self, job_id, succeeded):
+        """
+        入队的任务已结束
+
+        Returns:
+            bool: 展开和所有入队任务是否都已结束
+        """
+        self._outstanding.discard(job_id)
+        if not succeeded:
+            self.jobs_failed += 1
+        return self.settled
+
+    @property
+    def settled(self):
+        return self.expanded and not self._outstanding
+
+    def _build_opts(self):
+        return {
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+            'quiet': True,
+            'skip_download': True,
+        }
+
+    def _resolve(self, ydl, info):
+        """
+        逐级解析url结果
+
+        process=False时提取器可能只返回指向另一地址的url结果（如带list参数的
+        youtu.be短链接指向播放列表），需要继续提取才能知道是播放列表还是单个视频。
+        """
+        for _ in range(MAX_URL_RESOLVES):
+            if info.get('_type') not in ('url', 'url_transparent') or self._stop.is_set():
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        return info
+
+    def _run(self):
+        try:
+            cookiejar = cookie_file_cache.load(self.cookie_file) if self.cookie_file else None
+            with session_pool.session(self._build_opts(), cookiejar=cookiejar) as ydl:
+                info = self._resolve(ydl, ydl.extract_info(self.url, download=False, process=False))
+                if info.get('_type') in ('playlist', 'multi_video'):
+                    self._expand(info)
+                else:
+                    # 不是播放列表，按单个视频入队
+                    self._offer({'url': info.get('webpage_url') or self.url, 'title': info.get('title'),
+                                 'id': info.get('id'), 'ie_key': info.get('extractor_key')}, 1)
+        except Exception as e:
+            if not self._stop.is_set():
+                self.error = str(e)
+                self.failed.emit(self.error)
+        self.finished.emit(self.queued, self.skipped)
+
+    def _expand(self, playlist, counter=None):
+        """按顺序遍历条目，嵌套的播放列表递归展开"""
+        counter = counter if counter is not None else [0]
+        for entry in _iter_entries(playlist.get('entries')):
+            if self._stop.is_set():
+                return False
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist':
+                if self._expand(entry, counter) is False:
+                    return False
+                continue
+
+            counter[0] += 1
+            index = counter[0]
+            if self.max_index is not None and index > self.max_index:
+                return False
+            if self.contains(index) and self._offer(entry, index) is False:
+                return False
+        return True
+
+    def _offer(self, entry, index):
+        """跳过已下载的条目，其余条目在有空余额度时交给GUI线程入队"""
+        url = entry_url(entry)
+        if not url:
+            return True
+        key = entry_key(entry)
+        if self.newest_first and self.queued == 0 and self.skipped == 0 and self.newest_key is None:
+            self.newest_key = key
+        if self.sync and key is not None and key == self.high_water:
+            # 从新到旧排列的来源到达上次同步的位置，之后都是旧条目
+            return False
+
+        if key is not None:
+            archived = download_archive.lookup_key(entry['ie_key'], entry['id'])
+        else:
+            archived = download_archive.lookup(url)
+        if archived:
+            # 已下载的条目之后仍可能有新增或上次失败的条目，继续翻页
+            self.skipped += 1
+            return True
+
+        # 反压：已展开未开始下载的条目达到上限时等待
+        while not self._credits.acquire(timeout=CREDIT_POLL_INTERVAL):
+            if self._stop.is_set():
+                return False
+        if self._stop.is_set():
+            return False
+
+        self.queued += 1
+        self.entry_found.emit({'url': url, 'title': entry.get('title'), 'index': index})
+        return True
@@ -0,0 +1,101 @@
+import random
+import re
+
+# 错误类别
+ERROR_PERMANENT = 'permanent'  # 404、私有视频、地区限制等，重试无意义
+ERROR_RATE_LIMITED = 'rate_limited'  # 429/403、人机验证等，需要较长的退避
+ERROR_TRANSIENT = 'transient'  # 连接中断、超时等，短暂退避后重试
+
+_PERMANENT_PATTERN = re.compile(
+    r'HTTP Error (400|401|404|410)|Unsupported URL|is not a valid URL|Video unavailable'
+    r'|Private video|This video is private|members[- ]only|has been removed|account.*terminated'
+    r'|not available in your country|geo[- ]?restrict|confirm your age|copyright'
+    r'|No video formats found|Requested format is not available|DRM protected',
+    re.IGNORECASE
+)
+_RATE_LIMITED_PATTERN = re.compile(
+    r'HTTP Error (429|403)|Too Many Requests|rate[- ]?limit|confirm you.re not a bot',
+    re.IGNORECASE
+)
+
+# 每类错误的重试策略：(最多重试次数, 基础延迟秒数, 最大延迟秒数)
+RETRY_RULES = {
+    ERROR_PERMANENT: (0, 0, 0),
+    ERROR_RATE_LIMITED: (4, 30, 600),
+    ERROR_TRANSIENT: (5, 2, 120),
+}
+
+
+def _error_chain(error):
+    """依次返回异常本身及yt-dlp包装的原始异常"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        cause = exc_info[1] if exc_info else None
+        error = cause or error.__cause__
+
+
+def classify_error(error):
+    """
+    将下载异常分类为永久错误、限流错误或暂时性错误
+
+    Args:
+        error (Exception | str): yt-dlp抛出的异常或错误信息
+
+    Returns:
+        str: ERROR_PERMANENT / ERROR_RATE_LIMITED / ERROR_TRANSIENT
+    """
+    if isinstance(error, str):
+        messages = [error]
+    else:
+        messages = []
+        for exc in _error_chain(error):
+            name = type(exc).__name__
+            if name in ('GeoRestrictedError', 'UnsupportedError', 'CookieFileError'):
+                return ERROR_PERMANENT
+            messages.append(str(exc))
+
+    text = '\n'.join(messages)
+    if _RATE_LIMITED_PATTERN.search(text):
+        return ERROR_RATE_LIMITED
+    if _PERMANENT_PATTERN.search(text):
+        return ERROR_PERMANENT
+    return ERROR_TRANSIENT
+
+
+class RetryPolicy:
+    """
+    按错误类别的指数退避重试策略
+
+    永久错误立即失败；限流与暂时性错误按各自的基础延迟指数增长，
+    并加入随机抖动，避免大量任务同时重试。
+    """
+
+    def __init__(self, rules=None):
+        self.rules = dict(RETRY_RULES)
+        if rules:
+            self.rules.update(rules)
+
+    def next_delay(self, error_class, attempt):
+        """
+        计算下一次重试前的等待时间
+
+        Args:
+            error_class (str): classify_error返回的错误类别
+            attempt (int): 已失败的次数（从1开始）
+
+        Returns:
+            float: 等待秒数；不应再重试时为None
+        """
+        max_retries, base, cap = self.rules.get(error_class, RETRY_RULES[ERROR_TRANSIENT])
+        if attempt > max_retries:
+            return None
+        delay = min(cap, base * (2 ** (attempt - 1)))
+        # 等量抖动：保留一半延迟，另一半随机
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+# 默认重试策略
+retry_policy = RetryPolicy()
@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+import time
+
+from appPaths import data_path
+
+SYNC_FILE = "sync_sources.db"  # 同步源数据库文件（位于程序数据目录）
+
+
+class SyncSourceStore:
+    """
+    保存的同步源（播放列表/频道）
+
+    记录每个源的保存目录、清晰度以及高水位标记（上次同步时最新的
+    条目）。同步时按源的原始顺序展开并跳过已下载的条目；按最新优先
+    排列的频道遇到高水位条目即停止翻页。高水位标记只在本次入队的
+    任务全部成功后推进。
+    """
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or data_path(SYNC_FILE), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sources (
+                    url TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    quality TEXT,
+                    high_water TEXT,
+                    last_synced REAL,
+                    added REAL NOT NULL
+                )
+            ''')
+
+    def add(self, url, folder, quality):
+        """
+        保存同步源；已存在时更新保存目录和清晰度，保留高水位标记
+
+        Args:
+            url (str): 播放列表/频道URL
+            folder (str): 保存文件夹路径
+            quality (str): 视频清晰度
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO sources (url, folder, quality, added) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET folder = excluded.folder, quality = excluded.quality',
+                (url, folder, quality, time.time())
+            )
+
+    def get(self, url):
+        """
+        Returns:
+            dict: {'url', 'folder', 'quality', 'high_water', 'last_synced'}，不存在时为None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, folder, quality, high_water, last_synced FROM sources WHERE url = ?',
+                (url,)
+            ).fetchone()
+        keys = ('url', 'folder', 'quality', 'high_water', 'last_synced')
+        return dict(zip(keys, row)) if row else None
+
+    def sources(self):
+        """
+        Returns:
+            list: 所有同步源，按添加顺序
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, folder, quality, high_water, last_synced FROM sources ORDER BY added'
+            ).fetchall()
+        keys = ('url', 'folder', 'quality', 'high_water', 'last_synced')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def mark_synced(self, url, high_water=None):
+        """
+        记录一次成功的同步
+
+        Args:
+            url (str): 同步源URL
+            high_water (str): 本次同步看到的最新条目，为None时保留原标记
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE sources SET high_water = COALESCE(?, high_water), last_synced = ? WHERE url = ?',
+                (high_water, time.time(), url)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
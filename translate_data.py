@@ -142,5 +142,69 @@ translations = {
     'quality_label': {
         'cn': '🎬 清晰度：',
         'en': '🎬 Quality：'
+    },
+    'concurrency_label': {
+        'cn': '⚙️ 并发数：',
+        'en': '⚙️ Parallel：'
+    },
+    'pause_action': {
+        'cn': '⏸️ 暂停',
+        'en': '⏸️ Pause'
+    },
+    'resume_action': {
+        'cn': '▶️ 继续',
+        'en': '▶️ Resume'
+    },
+    'cancel_action': {
+        'cn': '⏹️ 取消',
+        'en': '⏹️ Cancel'
+    },
+    'pause_all_action': {
+        'cn': '⏸️ 全部暂停',
+        'en': '⏸️ Pause All'
+    },
+    'resume_all_action': {
+        'cn': '▶️ 全部继续',
+        'en': '▶️ Resume All'
+    },
+    'cancel_all_action': {
+        'cn': '⏹️ 全部取消',
+        'en': '⏹️ Cancel All'
+    },
+    'rate_limit_label': {
+        'cn': '🚦 限速：',
+        'en': '🚦 Limit：'
+    },
+    'rate_unlimited': {
+        'cn': '不限',
+        'en': 'Unlimited'
+    },
+    'host_rate_action': {
+        'cn': '🚦 限制该站点速度...',
+        'en': '🚦 Limit This Site...'
+    },
+    'host_rate_prompt': {
+        'cn': '站点 {host} 的限速（KB/s，0表示不限速）：',
+        'en': 'Rate limit for {host} (KB/s, 0 = unlimited):'
+    },
+    'playlist_mode': {
+        'cn': '📃 展开播放列表/频道',
+        'en': '📃 Expand playlists/channels'
+    },
+    'playlist_range_hint': {
+        'cn': '条目范围，如 1-50（留空为全部）',
+        'en': 'Item range, e.g. 1-50 (empty = all)'
+    },
+    'sync_button': {
+        'cn': '🔄 同步',
+        'en': '🔄 Sync'
+    },
+    'stream_mux': {
+        'cn': '边下载边合并',
+        'en': 'Merge while downloading'
+    },
+    'cookie_by_site': {
+        'cn': '按网站自动选择Cookie文件',
+        'en': 'Match cookie file by site'
     }
-}
\ No newline at end of file
+}
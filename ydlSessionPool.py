@@ -0,0 +1,145 @@
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import yt_dlp
+
+MAX_IDLE_PER_KEY = 2  # 每组选项最多保留的空闲会话数
+MAX_POOL_KEYS = 8  # 最多缓存多少组不同选项的会话
+
+# 每个任务各自绑定、不参与会话复用判断的选项
+_PER_TASK_OPTIONS = ('progress_hooks', 'logger')
+
+_MISSING = object()  # 借用前参数不存在的标记
+
+
+def _options_key(opts):
+    """根据有效选项（格式、cookiefile、后处理器等）生成会话池的键"""
+    effective = {k: v for k, v in opts.items() if k not in _PER_TASK_OPTIONS}
+    return json.dumps(effective, sort_keys=True, default=str)
+
+
+class YDLSessionPool:
+    """
+    YoutubeDL会话池
+
+    按有效选项缓存已初始化的YoutubeDL实例，任务借出使用后归还，
+    使提取器初始化、请求调度器以及其中的HTTP连接池（含TLS连接）
+    可以在任务和重试之间复用。借出期间一个实例只被一个线程使用。
+    """
+
+    def __init__(self, max_idle_per_key=MAX_IDLE_PER_KEY, max_keys=MAX_POOL_KEYS):
+        self.max_idle_per_key = max_idle_per_key
+        self.max_keys = max_keys
+        self._idle = OrderedDict()  # 选项键 -> [空闲的YoutubeDL实例]，按最近使用排序
+        self._lock = threading.Lock()
+
+    def acquire(self, opts, cookiejar=None):
+        """
+        借出一个与选项匹配的会话，没有空闲会话时新建
+
+        Args:
+            opts (dict): YoutubeDL选项，progress_hooks和logger不参与匹配
+            cookiejar (YoutubeDLCookieJar): 共享的Cookie jar，不同的jar使用不同的会话
+
+        Returns:
+            tuple: (选项键, YoutubeDL实例)
+        """
+        key = _options_key(opts)
+        if cookiejar is not None:
+            # 池中的会话引用着该jar，id在会话存在期间不会被复用
+            key += f'|cookiejar:{id(cookiejar)}'
+        with self._lock:
+            sessions = self._idle.get(key)
+            if sessions:
+                self._idle.move_to_end(key)
+                return key, sessions.pop()
+
+        base_opts = {k: v for k, v in opts.items() if k not in _PER_TASK_OPTIONS}
+        ydl = yt_dlp.YoutubeDL(base_opts)
+        if cookiejar is not None:
+            # 覆盖按cookiefile延迟加载的cookiejar，请求调度器创建时使用该jar
+            ydl.cookiejar = cookiejar
+        return key, ydl
+
+    def release(self, key, ydl, reusable=True):
+        """
+        归还会话；不可复用或池已满时关闭会话
+
+        Args:
+            key (str): acquire返回的选项键
+            ydl (YoutubeDL): 借出的实例
+            reusable (bool): 是否放回池中
+        """
+        # 清除任务级别的状态，避免串到下一个任务
+        ydl._progress_hooks = []
+        ydl.params['logger'] = None
+        ydl._download_retcode = 0
+
+        to_close = []
+        with self._lock:
+            sessions = self._idle.setdefault(key, []) if reusable else None
+            if sessions is not None and len(sessions) < self.max_idle_per_key:
+                sessions.append(ydl)
+                self._idle.move_to_end(key)
+            else:
+                to_close.append(ydl)
+                if sessions == []:
+                    del self._idle[key]
+
+            while len(self._idle) > self.max_keys:
+                _, evicted = self._idle.popitem(last=False)
+                to_close.extend(evicted)
+
+        for session in to_close:
+            self._close(session)
+
+    @contextmanager
+    def session(self, opts, progress_hook=None, logger=None, reusable=True, overrides=None, cookiejar=None):
+        """
+        以上下文管理器方式借用会话，并绑定本任务的进度回调和日志对象
+
+        Args:
+            opts (dict): YoutubeDL选项
+            progress_hook (callable): 进度回调
+            logger (object): yt-dlp日志对象
+            reusable (bool): 用完后是否放回池中
+            overrides (dict): 只在本次借用期间生效的参数（不参与会话选项键），归还时恢复
+            cookiejar (YoutubeDLCookieJar): 预先解析好的共享Cookie jar，代替cookiefile选项
+        """
+        key, ydl = self.acquire(opts, cookiejar)
+        ydl._progress_hooks = []
+        if progress_hook is not None:
+            ydl.add_progress_hook(progress_hook)
+        ydl.params['logger'] = logger
+        saved = {name: ydl.params.get(name, _MISSING) for name in overrides or {}}
+        ydl.params.update(overrides or {})
+        try:
+            yield ydl
+        finally:
+            for name, value in saved.items():
+                if value is _MISSING:
+                    ydl.params.pop(name, None)
+                else:
+                    ydl.params[name] = value
+            self.release(key, ydl, reusable)
+
+    def close_all(self):
+        """关闭池中所有空闲会话"""
+        with self._lock:
+            sessions = [ydl for group in self._idle.values() for ydl in group]
+            self._idle.clear()
+        for ydl in sessions:
+            self._close(ydl)
+
+    @staticmethod
+    def _close(ydl):
+        try:
+            ydl.close()
+        except Exception:
+            pass
+
+
+# 进程内共享的会话池
+session_pool = YDLSessionPool()